@@ -1,12 +1,15 @@
 import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import Connection, pool
-from sqlalchemy.ext.asyncio import async_engine_from_config
+from sqlalchemy import Connection, pool, text
 
 from alembic import context
 from app.core.settings import settings
 from app.models.product import ProductOrm  # noqa: F401
+from app.models.snapshot import PriceSnapshotOrm, OfferSnapshotOrm  # noqa: F401
+from app.models.rollup import PriceRollupOrm, CategoryPriceRollupOrm  # noqa: F401
+from app.models.seller_offer import SellerOfferOrm  # noqa: F401
+from app.models.change import ProductChangeOrm  # noqa: F401
 from app.models.base import BaseOrm
 
 # this is the Alembic Config object, which provides
@@ -56,12 +59,20 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+# Несколько реплик app запускают миграции одновременно, выполняет их только одна
+MIGRATIONS_LOCK_ID = 7_310_451
+
+
 def do_run_migrations(connection: Connection) -> None:
+    # Блокировка берется в транзакции соединения и снимается ее коммитом после миграций
+    connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
     context.configure(connection=connection, target_metadata=target_metadata)
 
     with context.begin_transaction():
         context.run_migrations()
 
+    connection.commit()
+
 
 async def run_async_migrations() -> None:
     """Run migrations in 'online' mode.
@@ -70,6 +81,9 @@ async def run_async_migrations() -> None:
     and associate a connection with the context.
 
     """
+    # Асинхронный движок и драйвер нужны только для online режима
+    from sqlalchemy.ext.asyncio import async_engine_from_config
+
     connectable = async_engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -0,0 +1,32 @@
+"""reset guessed categories
+
+Revision ID: 2c7f9e4a1b58
+Revises: 9d2c4b7e1a05
+Create Date: 2026-10-19 10:14:52.771036
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7f9e4a1b58'
+down_revision: Union[str, Sequence[str], None] = '9d2c4b7e1a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Категория бралась из первого categoryCodes, теперь - из хлебных крошек. Старые ключи с новыми не совпадают:
+    # продукты получат категорию при следующем обновлении, интервалы категорий накопятся заново
+    op.execute(sa.text("UPDATE products SET category = NULL WHERE category IS NOT NULL"))
+    op.execute(sa.text("DELETE FROM category_price_rollups"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Прежние ключи восстановятся при обновлении продуктов прежней версией
+    pass
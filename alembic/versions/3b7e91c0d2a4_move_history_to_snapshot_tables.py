@@ -0,0 +1,95 @@
+"""move price and offers history to snapshot tables
+
+Revision ID: 3b7e91c0d2a4
+Revises: 2651f4aad1e8
+Create Date: 2026-10-18 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e91c0d2a4'
+down_revision: Union[str, Sequence[str], None] = '2651f4aad1e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_snapshots',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('product_id', sa.Uuid(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=False),
+    sa.Column('max_price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_price_snapshots_product_id_created_at', 'price_snapshots', ['product_id', 'created_at'], unique=False)
+    op.create_table('offer_snapshots',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('product_id', sa.Uuid(), nullable=False),
+    sa.Column('offers', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_offer_snapshots_product_id_created_at', 'offer_snapshots', ['product_id', 'created_at'], unique=False)
+
+    # Переносим накопленную историю из JSONB массивов
+    op.execute("""
+        INSERT INTO price_snapshots (product_id, min_price, max_price, created_at)
+        SELECT p.id, (h.value->>'min_price')::float, (h.value->>'max_price')::float, (h.value->>'date')::timestamptz
+        FROM products p, jsonb_array_elements(p.price_history) WITH ORDINALITY AS h(value, ord)
+        ORDER BY p.id, h.ord
+    """)
+    op.execute("""
+        INSERT INTO offer_snapshots (product_id, offers, created_at)
+        SELECT p.id, h.value->'offers', (h.value->>'date')::timestamptz
+        FROM products p, jsonb_array_elements(p.offers_history) WITH ORDINALITY AS h(value, ord)
+        ORDER BY p.id, h.ord
+    """)
+
+    op.drop_column('products', 'offers_history')
+    op.drop_column('products', 'price_history')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('products', sa.Column('price_history', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False))
+    op.add_column('products', sa.Column('offers_history', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False))
+
+    op.execute("""
+        UPDATE products p SET price_history = s.history
+        FROM (
+            SELECT product_id, jsonb_agg(
+                jsonb_build_object('date', created_at, 'min_price', min_price, 'max_price', max_price)
+                ORDER BY created_at, id
+            ) AS history
+            FROM price_snapshots GROUP BY product_id
+        ) s
+        WHERE p.id = s.product_id
+    """)
+    op.execute("""
+        UPDATE products p SET offers_history = s.history
+        FROM (
+            SELECT product_id, jsonb_agg(
+                jsonb_build_object('date', created_at, 'offers', offers)
+                ORDER BY created_at, id
+            ) AS history
+            FROM offer_snapshots GROUP BY product_id
+        ) s
+        WHERE p.id = s.product_id
+    """)
+
+    op.alter_column('products', 'price_history', server_default=None)
+    op.alter_column('products', 'offers_history', server_default=None)
+
+    op.drop_index('ix_offer_snapshots_product_id_created_at', table_name='offer_snapshots')
+    op.drop_table('offer_snapshots')
+    op.drop_index('ix_price_snapshots_product_id_created_at', table_name='price_snapshots')
+    op.drop_table('price_snapshots')
@@ -0,0 +1,35 @@
+"""backfill product url
+
+Revision ID: 6b1e0d9c3f47
+Revises: 1f6c9a4e7b82
+Create Date: 2026-10-18 22:41:07.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1e0d9c3f47'
+down_revision: Union[str, Sequence[str], None] = '1f6c9a4e7b82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Продукты, сохраненные до появления url, планировщик не забирает (claim_due берет только url IS NOT NULL),
+    # а new_seed_urls пропускает их как известные. Канонической ссылке без slug хватает кода и города
+    op.execute(sa.text("""
+        UPDATE products
+        SET url = 'https://kaspi.kz/shop/p/' || product_code || '/?c=750000000'
+        WHERE url IS NULL
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Заполненные ссылки рабочие, откатывать нечего
+    pass
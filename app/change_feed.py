@@ -0,0 +1,90 @@
+"""
+Чтение ленты изменений продуктов (product_changes), нужен CHANGES__ENABLED=true у парсера.
+
+Запуск:
+    python -m app.change_feed [--offset-file changes.offset] [--follow] [--batch-size 1000]
+
+Печатает по строке JSON на событие. С --offset-file позиция последнего прочитанного события
+сохраняется после каждой пачки, и следующий запуск продолжает с нее. С --follow после конца ленты
+ждет NOTIFY product_changes (или --poll-seconds) и читает новые события.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from typing import Optional
+
+from app.core.db import get_engine
+from app.core.dependencies import get_product_service
+from app.repositories.repository import CHANGES_CHANNEL
+from app.schemes.product import ChangeOffset
+
+
+def read_offset(path: Optional[Path]) -> ChangeOffset:
+    if path is None or not path.exists():
+        return (0, 0)
+    xact_id, id = json.loads(path.read_text(encoding="utf-8"))
+    return (xact_id, id)
+
+
+def write_offset(path: Optional[Path], offset: ChangeOffset) -> None:
+    if path is None:
+        return
+    # Через временный файл, чтобы прерванная запись не испортила позицию
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(list(offset)), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+async def read_changes(offset: ChangeOffset, batch_size: int, offset_file: Optional[Path]) -> ChangeOffset:
+    """Печатает все доступные события после offset и возвращает новую позицию."""
+    while True:
+        async with get_product_service() as product_service:
+            changes = await product_service.get_changes(offset, batch_size)
+
+        for change in changes:
+            print(json.dumps(change.model_dump(mode="json"), ensure_ascii=False))
+        if changes:
+            offset = changes[-1].offset
+            write_offset(offset_file, offset)
+
+        if len(changes) < batch_size:
+            return offset
+
+
+async def main(args: argparse.Namespace) -> None:
+    offset = read_offset(args.offset_file)
+
+    if not args.follow:
+        await read_changes(offset, args.batch_size, args.offset_file)
+        return
+
+    notified = asyncio.Event()
+    async with get_engine().connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(CHANGES_CHANNEL, lambda *_: notified.set())
+
+        while True:
+            notified.clear()
+            offset = await read_changes(offset, args.batch_size, args.offset_file)
+            # События видны только после завершения более старых транзакций, поэтому кроме NOTIFY есть опрос
+            try:
+                await asyncio.wait_for(notified.wait(), args.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+def get_arguments(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="лента изменений продуктов")
+    parser.add_argument("--offset-file", type=Path, default=None, help="где хранить позицию в ленте")
+    parser.add_argument("--follow", action="store_true", help="ждать новые события")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(get_arguments()))
+    except KeyboardInterrupt:
+        pass
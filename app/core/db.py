@@ -1,7 +1,16 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from functools import cache
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.settings import settings
 
-engine = create_async_engine(settings.db.URL, pool_pre_ping=True, pool_recycle=3600)
 
-session_maker = async_sessionmaker(engine, expire_on_commit=False)
+# Движок создается при первом обращении, чтобы импорт app не загружал драйвер БД
+@cache
+def get_engine() -> AsyncEngine:
+    return create_async_engine(settings.db.URL, pool_pre_ping=True, pool_recycle=3600)
+
+
+@cache
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(get_engine(), expire_on_commit=False)
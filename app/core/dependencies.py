@@ -1,11 +1,29 @@
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
-from app.core.db import session_maker
+from app.core.db import get_session_maker
+from app.core.settings import settings
 from app.repositories.repository import ProductRepository
 from app.services.product_service import ProductService
+from app.services.product_writer import ProductWriter
+
+@asynccontextmanager
+async def get_product_repository() -> AsyncIterator[ProductRepository]:
+    async with get_session_maker()() as session:
+        yield ProductRepository(
+            session,
+            offers_keyframe_interval=settings.db.OFFERS_KEYFRAME_INTERVAL,
+            change_feed=settings.changes.ENABLED,
+        )
 
 @asynccontextmanager
 async def get_product_service() -> AsyncIterator[ProductService]:
-    async with session_maker() as session:
-        yield ProductService(ProductRepository(session))
\ No newline at end of file
+    async with get_product_repository() as product_repository:
+        yield ProductService(product_repository)
+
+def get_product_writer() -> ProductWriter:
+    return ProductWriter(
+        repository_factory=get_product_repository,
+        batch_size=settings.db.WRITE_BATCH_SIZE,
+        flush_interval=settings.db.WRITE_FLUSH_SECONDS,
+    )
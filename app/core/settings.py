@@ -1,6 +1,7 @@
 import json
 import logging
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -11,12 +12,121 @@ logger = logging.getLogger(__name__)
 
 class DBSettings(BaseModel):
     URL: str
+    WRITE_BATCH_SIZE: int = 100
+    WRITE_FLUSH_SECONDS: float = 1.0
+    # Каждый какой снимок офферов хранить целиком, между ними хранится только разница по продавцам
+    OFFERS_KEYFRAME_INTERVAL: int = 20
 
 class ParserSettings(BaseModel):
     SLEEP_TIME_MINUTES: int
+    FRESHNESS_CHUNK_SIZE: int = 1000
+    OFFERS_PAGES_CONCURRENCY: int = 4
+    # Сколько процессов разбирают страницы, 0 - разбор в event loop. Сейчас пул медленнее разбора в event loop
+    # при любом числе процессов (benchmarks/parse_pool_benchmark.py): передача страницы в процесс дороже самого разбора
+    PARSE_PROCESSES: int = 0
 
 class AsyncioSettings(BaseModel):
+    # Воркеры загрузки страниц
     MAX_CONCURRENT_TASKS: int = 1
+    # Воркеры разбора страниц вместе с запросами отзывов и офферов
+    PARSE_WORKERS: int = 1
+    # Воркеры записи, записи копятся в пачки до DB__WRITE_BATCH_SIZE
+    WRITE_WORKERS: int = 100
+    # Размер очереди между стадиями
+    QUEUE_SIZE: int = 100
+
+class HttpSettings(BaseModel):
+    TIMEOUT_SECONDS: float = 10.0
+    CONNECT_TIMEOUT_SECONDS: float = 5.0
+    MAX_CONNECTIONS: int = 100
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+    KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    # Для HTTP/2 нужен пакет h2 (pip install "httpx[http2]")
+    HTTP2: bool = False
+
+class RateLimitSettings(BaseModel):
+    # Начальная скорость запросов в секунду на каждый endpoint Kaspi
+    RATE_PER_SECOND: float = 5.0
+    BURST: int = 10
+    MIN_RATE_PER_SECOND: float = 0.5
+    MAX_RATE_PER_SECOND: float = 50.0
+    # Прибавка к скорости за успешный ответ и множитель при 429/503
+    INCREASE_STEP: float = 0.05
+    DECREASE_FACTOR: float = 0.5
+    MAX_RETRIES: int = 4
+    BACKOFF_BASE_SECONDS: float = 0.5
+    BACKOFF_MAX_SECONDS: float = 30.0
+
+class ExportSettings(BaseModel):
+    DIR: str = "export"
+    # Компактный JSON без пробелов после разделителей
+    COMPACT: bool = True
+
+class PageCacheSettings(BaseModel):
+    ENABLED: bool = False
+    PATH: str = "cache/pages.sqlite3"
+    MAX_ENTRIES: int = 100_000
+    # Через сколько минут продукт парсится полностью, даже если страница не менялась
+    MAX_AGE_MINUTES: int = 24 * 60
+
+class SchedulerSettings(BaseModel):
+    # Вместо полного прохода по seed раз в SLEEP_TIME_MINUTES обновлять каждый продукт по его next_due_at
+    ENABLED: bool = False
+    MIN_INTERVAL_MINUTES: float = 15
+    MAX_INTERVAL_MINUTES: float = 24 * 60
+    # Во сколько раз растет интервал без изменений и уменьшается при изменениях
+    INCREASE_FACTOR: float = 1.5
+    DECREASE_FACTOR: float = 0.5
+    # Сколько продуктов забирать за раз и на сколько минут их откладывать, пока они в работе
+    BATCH_SIZE: int = 100
+    LEASE_MINUTES: float = 30
+    POLL_SECONDS: float = 60
+
+class WorkerSettings(BaseModel):
+    # Несколько процессов/контейнеров делят seed по hash(product_code) % SHARD_COUNT.
+    # В режиме планировщика продукты из БД делятся через FOR UPDATE SKIP LOCKED без шардов
+    SHARD_INDEX: int = 0
+    SHARD_COUNT: int = 1
+
+class SeedSettings(BaseModel):
+    # .json ({"products_urls": [...]}), .jsonl или текстовый файл со ссылкой в строке
+    PATH: str = "seed.json"
+    # set - точное множество product_code, bloom - фиксированная память с долей ложных повторов BLOOM_ERROR_RATE
+    DEDUP: Literal["set", "bloom"] = "set"
+    BLOOM_CAPACITY: int = 10_000_000
+    BLOOM_ERROR_RATE: float = 1e-6
+
+class DiscoverySettings(BaseModel):
+    # Искать новые товары в категориях и поиске Kaspi и добавлять их к ссылкам из seed
+    ENABLED: bool = False
+    # Коды категорий и поисковые запросы, в .env списком JSON: ["Smartphones", "Notebooks"]
+    CATEGORIES: list[str] = []
+    QUERIES: list[str] = []
+    CITY_ID: str = "750000000"
+    # Сколько страниц листинга запрашивать одновременно
+    CONCURRENCY: int = 4
+    MAX_PAGES: int = 1000
+    # Между полными обходами листинга проходятся только первые страницы до уже известных товаров
+    FULL_RESCAN_HOURS: float = 24
+    STATE_PATH: str = "cache/listings.sqlite3"
+
+class ChangesSettings(BaseModel):
+    # Писать изменения продуктов в таблицу product_changes и NOTIFY product_changes
+    ENABLED: bool = False
+    # Сколько дней хранить события, старые удаляются после каждого цикла
+    RETENTION_DAYS: int = 30
+
+class StateCacheSettings(BaseModel):
+    # Держать в памяти id, updated_at, цены и хеш состояния продуктов, чтобы не читать строки неизменившихся из БД.
+    # Кеш не видит записи других процессов: включать с одним воркером или с шардами (WORKER__SHARD_COUNT)
+    ENABLED: bool = False
+    MAX_ENTRIES: int = 1_000_000
+
+class MetricsSettings(BaseModel):
+    # Локальный endpoint /metrics в формате Prometheus
+    ENABLED: bool = False
+    HOST: str = "127.0.0.1"
+    PORT: int = 9100
 
 class CommonSettings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -26,6 +136,17 @@ class CommonSettings(BaseSettings):
     db: DBSettings
     parser: ParserSettings
     asyncio: AsyncioSettings
+    http: HttpSettings = HttpSettings()
+    rate_limit: RateLimitSettings = RateLimitSettings()
+    page_cache: PageCacheSettings = PageCacheSettings()
+    export: ExportSettings = ExportSettings()
+    scheduler: SchedulerSettings = SchedulerSettings()
+    worker: WorkerSettings = WorkerSettings()
+    seed: SeedSettings = SeedSettings()
+    discovery: DiscoverySettings = DiscoverySettings()
+    changes: ChangesSettings = ChangesSettings()
+    state_cache: StateCacheSettings = StateCacheSettings()
+    metrics: MetricsSettings = MetricsSettings()
 
 settings = CommonSettings() # type: ignore
 
@@ -1,14 +1,25 @@
 import asyncio
 from datetime import datetime, timedelta, timezone
-import json
+from functools import partial
 import logging
 from pathlib import Path
-import traceback
+from typing import AsyncIterator
 
 from app.core.settings import settings
-from app.core.dependencies import get_product_service
-from app.services.parser_service import instagram_scraper
+from app.core.dependencies import get_product_service, get_product_writer
+from app.services.discovery_service import Listing, ListingCrawler
+from app.services.export_service import ExportService
+from app.services.listing_state import ListingState
+from app.services.parser_service import get_kaspi_scraper
+from app.services.pipeline_service import ScrapePipeline
+from app.services.product_state_cache import ProductStateCache
+from app.services.product_writer import ProductWriter
+from app.services.scheduler_service import ProductScheduler
+from app.services.seed_loader import SeedLoader
 from app.utils.json_formatter import JsonFormatter
+from app.utils.metrics import metrics, start_metrics_server
+from app.utils.product_url import ProductUrl
+from app.utils.sharding import is_own_shard
 
 # Установливаем JsonFormatter для глобального логгера
 root_logger = logging.getLogger()
@@ -22,94 +33,190 @@ root_logger.addHandler(handler)
 
 logger = logging.getLogger(__name__)
 
-# Путь где хранить результаты
-EXPORT_DIR = Path("export")
-
-async def process_url(url: str, semaphore: asyncio.Semaphore, products_info: dict, products_offers_info: dict, skipped_urls: list):
-    """Обрабатывает один продукт по ссылке с ограничением параллельных запросов."""
-    async with semaphore:
-        logger.info("Processing URL...", extra={"url": url})
-
-        offers_info = {"offers": [], "offers_history": []}
+# Путь где хранить результаты, у каждого шарда свой экспорт
+EXPORT_DIR = Path(settings.export.DIR)
+if settings.worker.SHARD_COUNT > 1:
+    EXPORT_DIR = EXPORT_DIR / f"shard-{settings.worker.SHARD_INDEX}"
+
+# Кеш состояний продуктов живет весь процесс и переживает циклы
+product_state_cache = ProductStateCache(settings.state_cache.MAX_ENTRIES) if settings.state_cache.ENABLED else None
+
+def create_seed_loader() -> SeedLoader:
+    return SeedLoader(
+        Path(settings.seed.PATH),
+        dedup=settings.seed.DEDUP,
+        bloom_capacity=settings.seed.BLOOM_CAPACITY,
+        bloom_error_rate=settings.seed.BLOOM_ERROR_RATE,
+    )
+
+def create_listing_crawler() -> ListingCrawler:
+    return ListingCrawler(
+        scraper=get_kaspi_scraper(),
+        city_id=settings.discovery.CITY_ID,
+        concurrency=settings.discovery.CONCURRENCY,
+        max_pages=settings.discovery.MAX_PAGES,
+        full_rescan_seconds=settings.discovery.FULL_RESCAN_HOURS * 3600,
+        state=ListingState(Path(settings.discovery.STATE_PATH)),
+    )
+
+def get_listings() -> list[Listing]:
+    return [
+        *(Listing("category", category) for category in settings.discovery.CATEGORIES),
+        *(Listing("search", query) for query in settings.discovery.QUERIES),
+    ]
+
+async def load_seed_urls(rescan_discovered: bool = True) -> AsyncIterator[str]:
+    """
+    Канонические ссылки без повторов, которые относятся к шарду этого воркера: сначала из seed (файл читается
+    потоково), затем новые товары из листингов, которых нет в seed. С rescan_discovered в конце идут товары,
+    найденные в прошлые обходы листингов: без планировщика цикл обновляет их так же, как seed. Планировщику
+    они не нужны, уже записанные продукты он обновляет по расписанию.
+    """
+    seed_loader = create_seed_loader()
+    seen = seed_loader.create_seen()
+
+    for product_url in seed_loader.iter_products(seen):
+        if is_own_shard(product_url.product_code, settings.worker.SHARD_INDEX, settings.worker.SHARD_COUNT):
+            yield product_url.url
+
+    if not settings.discovery.ENABLED:
+        return
+
+    def is_new_own(product_url: ProductUrl) -> bool:
+        return (
+            seed_loader.add_seen(seen, product_url.product_code)
+            and is_own_shard(product_url.product_code, settings.worker.SHARD_INDEX, settings.worker.SHARD_COUNT)
+        )
+
+    crawler = create_listing_crawler()
+    async for product_url in crawler.discover(get_listings()):
+        if is_new_own(product_url):
+            yield product_url.url
+
+    if rescan_discovered:
+        for product_url in crawler.iter_known():
+            if is_new_own(product_url):
+                yield product_url.url
+
+def create_pipeline(product_writer: ProductWriter, export_service: ExportService, **kwargs) -> ScrapePipeline:
+    return ScrapePipeline(
+        scraper=get_kaspi_scraper(),
+        product_service_factory=get_product_service,
+        product_writer=product_writer,
+        export_service=export_service,
+        fetch_workers=settings.asyncio.MAX_CONCURRENT_TASKS,
+        parse_workers=settings.asyncio.PARSE_WORKERS,
+        write_workers=settings.asyncio.WRITE_WORKERS,
+        queue_size=settings.asyncio.QUEUE_SIZE,
+        freshness=timedelta(minutes=settings.parser.SLEEP_TIME_MINUTES),
+        chunk_size=settings.parser.FRESHNESS_CHUNK_SIZE,
+        flush_interval=settings.db.WRITE_FLUSH_SECONDS,
+        state_cache=product_state_cache,
+        **kwargs,
+    )
+
+async def warm_product_state_cache():
+    """Загружает состояния последних обновленных продуктов одним потоковым запросом."""
+    if product_state_cache is None:
+        return
+
+    # Без прогрева кеш заполняется по мере записи продуктов
+    try:
+        async with get_product_service() as product_service:
+            await product_state_cache.warm(product_service.iter_product_states(settings.state_cache.MAX_ENTRIES))
+    except Exception as e:
+        logger.error("Error warming product state cache", extra={"error": str(e)})
 
-        try:
-            product_code = instagram_scraper.get_product_code_from_url(url)
-
-            async with get_product_service() as product_service:
-                product_db = await product_service.get_by_product_code(product_code)
-
-                # Если продукт недавно обновлялся
-                if product_db and datetime.now(timezone.utc) - product_db.updated_at < timedelta(minutes=settings.parser.SLEEP_TIME_MINUTES):
-                    logger.info(
-                        f"Skipping product (already updated <{settings.parser.SLEEP_TIME_MINUTES} min ago)",
-                        extra={"product_code": product_code}
-                    )
-                    products_info[url] = product_db.model_dump(
-                        mode="json",
-                        exclude={"id", "created_at", "updated_at", "offers", "offers_history"}
-                    )
-                    offers_info["offers"].append(product_db.offers)
-                    offers_info["offers_history"].append(product_db.offers_history)
-                    products_offers_info[url] = offers_info
-                    return
-
-                # Парсим данные
-                product_new = await instagram_scraper.scrape_product_by_url(url)
-
-                # Обновляем/создаем
-                if product_db:
-                    product_db = await product_service.update_by_difference(original=product_db, new=product_new)
-                    logger.info("Product updated", extra={"product_code": product_code})
-                else:
-                    product_db = await product_service.create(product_new)
-                    logger.info("Product created", extra={"product_code": product_code})
-
-            # Сохраняем офферы
-            offers_info["offers"].append(product_db.offers)
-            offers_info["offers_history"].append(product_db.offers_history)
-            products_offers_info[url] = offers_info
-            products_info[url] = product_db.model_dump(
-                mode="json",
-                exclude={"id", "created_at", "updated_at", "offers", "offers_history"}
-            )
+async def delete_old_changes():
+    if not settings.changes.ENABLED:
+        return
 
-        except Exception as e:
-            logger.error(
-                "Error during product scraping",
-                extra={"url": url, "error": str(e), "traceback": traceback.format_exc()}
+    # Очистка ленты повторится в следующем цикле, ее ошибка не должна останавливать парсер
+    try:
+        async with get_product_service() as product_service:
+            deleted = await product_service.delete_changes_before(
+                datetime.now(timezone.utc) - timedelta(days=settings.changes.RETENTION_DAYS)
             )
-            skipped_urls.append({"url": url, "error": str(e)})
+    except Exception as e:
+        logger.error("Error deleting old product changes", extra={"error": str(e)})
+        return
+    logger.info("Old product changes deleted", extra={"deleted": deleted})
 
 async def kaspi_products_scrapping():
-    with open("seed.json", "r", encoding="utf-8") as f:
-        urls = json.load(f)["products_urls"]
-
-    products_info = {}
-    products_offers_info = {}
-    skipped_urls = []
-
-    semaphore = asyncio.Semaphore(settings.asyncio.MAX_CONCURRENT_TASKS)
-
-    tasks = [process_url(url, semaphore, products_info, products_offers_info, skipped_urls) for url in urls]
-    await asyncio.gather(*tasks)
-
-    # Сохраняем результаты
-    with (EXPORT_DIR / "seed.json").open("w", encoding="utf-8") as f:
-        json.dump({"products_info": products_info}, f, indent=4, ensure_ascii=False)
+    urls = load_seed_urls()
+
+    # Результаты пишутся построчно по мере обработки и подменяют файлы только в конце цикла
+    with ExportService(EXPORT_DIR, compact=settings.export.COMPACT) as export_service:
+        async with get_product_writer() as product_writer:
+            pipeline = create_pipeline(product_writer, export_service)
+            await pipeline.run_stream(urls, plan=True)
+
+    await delete_old_changes()
+
+    logger.info("Rate limiter stats", extra={"rate_limiter": get_kaspi_scraper().rate_limiter.get_stats()})
+    logger.info("Cycle summary", extra={"metrics": metrics.get_cycle_summary()})
+
+async def kaspi_products_scheduling():
+    """Непрерывно обновляет продукты по расписанию, экспорт публикуется раз в SLEEP_TIME_MINUTES."""
+    scheduler = ProductScheduler(
+        scraper=get_kaspi_scraper(),
+        product_service_factory=get_product_service,
+        seed_loader=partial(load_seed_urls, rescan_discovered=False),
+        batch_size=settings.scheduler.BATCH_SIZE,
+        lease=timedelta(minutes=settings.scheduler.LEASE_MINUTES),
+        min_interval=settings.scheduler.MIN_INTERVAL_MINUTES,
+        max_interval=settings.scheduler.MAX_INTERVAL_MINUTES,
+        increase_factor=settings.scheduler.INCREASE_FACTOR,
+        decrease_factor=settings.scheduler.DECREASE_FACTOR,
+        poll_interval=timedelta(seconds=settings.scheduler.POLL_SECONDS),
+        seed_reload=timedelta(minutes=settings.parser.SLEEP_TIME_MINUTES),
+        state_cache=product_state_cache,
+    )
+
+    with ExportService(EXPORT_DIR, compact=settings.export.COMPACT) as export_service:
+        async def rotate_export():
+            while True:
+                await asyncio.sleep(settings.parser.SLEEP_TIME_MINUTES * 60)
+                try:
+                    export_service.rotate()
+                except Exception as e:
+                    logger.error("Error rotating export", extra={"error": str(e)})
+                await delete_old_changes()
+                logger.info("Rate limiter stats", extra={"rate_limiter": get_kaspi_scraper().rate_limiter.get_stats()})
+                logger.info("Cycle summary", extra={"metrics": metrics.get_cycle_summary()})
+
+        rotate_task = asyncio.create_task(rotate_export())
+        try:
+            async with get_product_writer() as product_writer:
+                pipeline = create_pipeline(product_writer, export_service, reschedule=scheduler.reschedule)
+                await pipeline.run_stream(scheduler.urls())
+        finally:
+            rotate_task.cancel()
 
-    with (EXPORT_DIR / "offers.json").open("w", encoding="utf-8") as f:
-        json.dump(products_offers_info, f, indent=4, ensure_ascii=False)
+async def run():
+    await warm_product_state_cache()
 
-    with (EXPORT_DIR / "skipped_urls.json").open("w", encoding="utf-8") as f:
-        json.dump(skipped_urls, f, indent=4, ensure_ascii=False)
+    if settings.scheduler.ENABLED:
+        logger.info("Starting scheduler...")
+        await kaspi_products_scheduling()
+        return
 
-async def main():
     while True:
         logger.info("Starting scrapping...")
         await kaspi_products_scrapping()
         logger.info(f"Sleeping for {settings.parser.SLEEP_TIME_MINUTES} minutes...")
         await asyncio.sleep(settings.parser.SLEEP_TIME_MINUTES * 60)
 
+async def main():
+    if settings.metrics.ENABLED:
+        await start_metrics_server(settings.metrics.HOST, settings.metrics.PORT)
+
+    try:
+        await run()
+    finally:
+        # Без этого процессы пула разбора переживают остановку по Ctrl+C или ошибке
+        await get_kaspi_scraper().aclose()
+
 
 if __name__ == "__main__":
     try:
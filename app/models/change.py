@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, String, func, text, UUID as SqlUUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import BaseOrm
+
+
+class ProductChangeOrm(BaseOrm):
+    """
+    Лента изменений продуктов (outbox): строка пишется в одной транзакции с самим изменением.
+    Читается по возрастанию (xact_id, id) и только до самой старой незавершенной транзакции,
+    поэтому событие не может появиться позади уже прочитанных.
+    """
+    __tablename__ = "product_changes"
+    __table_args__ = (
+        Index("ix_product_changes_xact_id_id", "xact_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    xact_id: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default=text("pg_current_xact_id()::text::bigint")
+    )
+
+    product_id: Mapped[UUID] = mapped_column(
+        SqlUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
+    product_code: Mapped[str] = mapped_column(String(50), nullable=False)
+    # created или updated
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    changes: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<ProductChange(product_code={self.product_code}, kind={self.kind}, changes={list(self.changes)})>"
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
-from typing import Any
-from sqlalchemy import DateTime, Float, Integer, String, func, UUID as SqlUUID
+from typing import Any, Optional
+from sqlalchemy import DateTime, Float, Index, Integer, String, func, UUID as SqlUUID
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import JSONB
 from uuid import uuid4, UUID
@@ -10,41 +10,57 @@ from app.models.base import BaseOrm
 
 class ProductOrm(BaseOrm):
     __tablename__ = "products"
+    __table_args__ = (
+        # min/max цен категории для price rollup - один шаг по индексу вместо агрегата по всем ее продуктам
+        Index("ix_products_category_min_price", "category", "min_price"),
+        Index("ix_products_category_max_price", "category", "max_price"),
+    )
 
     id: Mapped[UUID] = mapped_column(SqlUUID(as_uuid=True), primary_key=True, default=uuid4)
     
     product_code: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
+    url: Mapped[Optional[str]] = mapped_column(String(2048), nullable=True)
+    # Категория товара - последняя хлебная крошка страницы
+    category: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     min_price: Mapped[float] = mapped_column(Float, nullable=False)
     max_price: Mapped[float] = mapped_column(Float, nullable=False)
     rating: Mapped[float] = mapped_column(Float, default=0.0)
     comments_count: Mapped[int] = mapped_column(Integer, default=0)
 
-    price_history: Mapped[list[dict]] = mapped_column(JSONB, default=lambda: [])
-
     image_links: Mapped[list[str]] = mapped_column(JSONB, default=lambda: [])
 
     details: Mapped[dict[str, Any]] = mapped_column(JSONB, default=lambda: {})
     offers: Mapped[list[dict[str, Any]]] = mapped_column(JSONB, default=lambda: [])
 
-    offers_history: Mapped[list[dict]] = mapped_column(JSONB, default=lambda: [])
-
     sellers_count: Mapped[int] = mapped_column(Integer, default=0)
 
+    # Отпечатки image_links/details/offers для сравнения без чтения самих полей
+    fingerprints: Mapped[dict[str, str]] = mapped_column(JSONB, nullable=False, default=lambda: {}, server_default="{}")
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
     )
 
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(timezone.utc),
+        default=lambda: datetime.now(timezone.utc),
         server_default=func.now(),
-        onupdate=datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
         server_onupdate=func.now(),
     )
 
+    # Когда продукт нужно обновить и как часто, интервал подстраивается под частоту изменений
+    refresh_interval_minutes: Mapped[float] = mapped_column(Float, nullable=False, server_default="60")
+    next_due_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True,
+    )
+
     def __repr__(self) -> str:
         return f"<Product(code={self.product_code}, name={self.name}, rating={self.rating})>"
\ No newline at end of file
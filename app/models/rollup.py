@@ -0,0 +1,49 @@
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, UUID as SqlUUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseOrm
+
+
+class PriceRollupOrm(BaseOrm):
+    """
+    Цены продукта по часам и дням. Обновляется при каждом снимке цены: min/max за интервал
+    с учетом цены, действовавшей на его начало, и close - цена на конец интервала.
+    Интервала без строки нет в таблице, в нем действует close предыдущего.
+    """
+    __tablename__ = "price_rollups"
+
+    product_id: Mapped[UUID] = mapped_column(
+        SqlUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    # hour или day, как в date_trunc
+    resolution: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+
+    min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    max_price: Mapped[float] = mapped_column(Float, nullable=False)
+    close_min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    close_max_price: Mapped[float] = mapped_column(Float, nullable=False)
+    # Сколько снимков цены попало в интервал
+    changes: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    def __repr__(self) -> str:
+        return f"<PriceRollup(product_id={self.product_id}, {self.resolution}={self.bucket_start})>"
+
+
+class CategoryPriceRollupOrm(BaseOrm):
+    """То же по категории: min/max цен всех продуктов категории за интервал."""
+    __tablename__ = "category_price_rollups"
+
+    category: Mapped[str] = mapped_column(String(255), primary_key=True)
+    resolution: Mapped[str] = mapped_column(String(8), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+
+    min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    max_price: Mapped[float] = mapped_column(Float, nullable=False)
+    close_min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    close_max_price: Mapped[float] = mapped_column(Float, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<CategoryPriceRollup(category={self.category}, {self.resolution}={self.bucket_start})>"
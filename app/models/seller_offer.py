@@ -0,0 +1,36 @@
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, func, UUID as SqlUUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseOrm
+
+
+class SellerOfferOrm(BaseOrm):
+    """
+    Текущие офферы продуктов по продавцам: индекс продавец -> (продукт, цена, место), чтобы запросы
+    по продавцу не разбирали JSONB offers всех продуктов. Обновляется вместе с offers продукта.
+    """
+    __tablename__ = "seller_offers"
+    __table_args__ = (
+        Index("ix_seller_offers_seller_price", "seller", "price"),
+        Index("ix_seller_offers_seller_rank", "seller", "rank"),
+    )
+
+    product_id: Mapped[UUID] = mapped_column(
+        SqlUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True
+    )
+    seller: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+    price: Mapped[float] = mapped_column(Float, nullable=False)
+    # Место по цене среди продавцов продукта, 1 - самый дешевый (при равной цене место общее)
+    rank: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"<SellerOffer(seller={self.seller}, product_id={self.product_id}, price={self.price}, rank={self.rank})>"
@@ -0,0 +1,63 @@
+from datetime import datetime
+from typing import Any, Optional
+from uuid import UUID
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer, func, UUID as SqlUUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import BaseOrm
+
+
+class PriceSnapshotOrm(BaseOrm):
+    __tablename__ = "price_snapshots"
+    __table_args__ = (
+        Index("ix_price_snapshots_product_id_created_at", "product_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+
+    product_id: Mapped[UUID] = mapped_column(
+        SqlUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
+
+    min_price: Mapped[float] = mapped_column(Float, nullable=False)
+    max_price: Mapped[float] = mapped_column(Float, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PriceSnapshot(product_id={self.product_id}, min_price={self.min_price}, max_price={self.max_price})>"
+
+
+class OfferSnapshotOrm(BaseOrm):
+    __tablename__ = "offer_snapshots"
+    __table_args__ = (
+        Index("ix_offer_snapshots_product_id_created_at", "product_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+
+    product_id: Mapped[UUID] = mapped_column(
+        SqlUUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
+
+    # Опорный снимок хранит весь список офферов, остальные - только разницу с предыдущим снимком
+    offers: Mapped[Optional[list[dict[str, Any]]]] = mapped_column(JSONB, nullable=True)
+    delta: Mapped[Optional[dict[str, Any]]] = mapped_column(JSONB, nullable=True)
+    # Сколько снимков прошло с опорного, 0 - опорный снимок
+    keyframe_distance: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    def __repr__(self) -> str:
+        if self.offers is None:
+            return f"<OfferSnapshot(product_id={self.product_id}, delta={list(self.delta)})>"
+        return f"<OfferSnapshot(product_id={self.product_id}, offers={len(self.offers)})>"
@@ -0,0 +1,60 @@
+"""
+Ряд min/max цен по часам или дням за период для продуктов или категории.
+
+Запуск:
+    python -m app.price_history --product 123456789 987654321 [--from 2026-01-01] [--to 2026-02-01] [--resolution day]
+    python -m app.price_history --category Смартфоны --resolution hour --from 2026-01-01T00:00
+
+Печатает по строке JSON на интервал с изменением цены, в пропущенных интервалах действует close предыдущего.
+Первый интервал может начинаться до --from: его close - цена на начало ряда. Без --from берется год до --to, без --to - текущий момент.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+from typing import Optional
+
+from app.core.dependencies import get_product_service
+from app.schemes.product import PriceRollupS, ProductFreshnessS
+
+
+def parse_datetime(value: str) -> datetime:
+    """ISO дата или дата со временем, без часового пояса считается UTC."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def print_buckets(buckets: list[PriceRollupS], **key) -> None:
+    for bucket in buckets:
+        print(json.dumps({**key, **bucket.model_dump(mode="json")}, ensure_ascii=False))
+
+
+async def main(args: argparse.Namespace) -> None:
+    end: datetime = args.to or datetime.now(timezone.utc)
+    start: datetime = args.from_ or end - timedelta(days=365)
+
+    async with get_product_service() as product_service:
+        if args.category:
+            buckets = await product_service.get_category_price_series(args.category, start, end, args.resolution)
+            print_buckets(buckets, category=args.category)
+            return
+
+        products = await product_service.get_by_product_codes(args.product, ProductFreshnessS)
+        series = await product_service.get_price_series([product.id for product in products], start, end, args.resolution)
+        for product in products:
+            print_buckets(series.get(product.id, []), product_code=product.product_code)
+
+
+def get_arguments(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="min/max цены по часам или дням")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--product", nargs="+", help="product_code продуктов")
+    target.add_argument("--category", help="категория товара, последняя хлебная крошка на странице Kaspi")
+    parser.add_argument("--from", dest="from_", type=parse_datetime, default=None)
+    parser.add_argument("--to", type=parse_datetime, default=None)
+    parser.add_argument("--resolution", choices=["hour", "day"], default="day")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(get_arguments()))
@@ -1,41 +1,698 @@
-from typing import Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Collection, Mapping, Optional, TypeVar
 from uuid import UUID
-from sqlalchemy import select, update
+from pydantic import BaseModel
+from sqlalchemy import (
+    BigInteger,
+    ColumnElement,
+    Float,
+    Integer,
+    Row,
+    String,
+    Subquery,
+    Text,
+    any_,
+    column,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PgUUID, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from app.schemes.product import ProductBaseS, ProductReadS
+from app.schemes.product import (
+    ChangeOffset,
+    OfferSnapshotS,
+    PriceResolution,
+    PriceRollupS,
+    PriceSnapshotS,
+    ProductBaseS,
+    ProductChangeS,
+    ProductReadS,
+    ProductSummaryS,
+    SellerOfferS,
+)
+from app.models.change import ProductChangeOrm
 from app.models.product import ProductOrm
+from app.models.rollup import CategoryPriceRollupOrm, PriceRollupOrm
+from app.models.seller_offer import SellerOfferOrm
+from app.models.snapshot import OfferSnapshotOrm, PriceSnapshotOrm
+from app.utils.changes import TRACKED_FIELDS, get_field_changes, get_offers_changes
+from app.utils.metrics import timed
+from app.utils.offers_delta import apply_offers_delta, get_offers_delta, get_seller_ranks
+from app.utils.price_rollup import RESOLUTIONS, truncate
+
+Projection = TypeVar("Projection", bound=BaseModel)
+
+# Офферы продукта до записи и keyframe_distance его последнего снимка офферов
+OffersState = tuple[list[dict[str, Any]], Optional[int]]
+
+# Канал NOTIFY, в который пишется после коммита событий ленты изменений
+CHANGES_CHANNEL = "product_changes"
 
 class ProductRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, offers_keyframe_interval: int = 20, change_feed: bool = False):
         self.session = session
+        self.offers_keyframe_interval = offers_keyframe_interval
+        # Писать ли изменения продуктов в product_changes
+        self.change_feed = change_feed
+
 
+    @timed
+    async def upsert_many(
+        self,
+        schemas: list[ProductBaseS],
+        price_codes: Collection[str] = (),
+        offer_codes: Collection[str] = (),
+        changes: Optional[Mapping[str, dict]] = None,
+    ) -> list[ProductReadS]:
+        """
+        Сохраняет пачку продуктов одним INSERT ... ON CONFLICT (product_code) DO UPDATE ... RETURNING
+        и одним коммитом. Для product_code из price_codes/offer_codes дописывает снимки истории.
+        changes - изменения скалярных полей обновленных продуктов (app.utils.changes) для ленты изменений.
+        """
+        if not schemas:
+            return []
 
-    async def save(self, schema: ProductBaseS) -> ProductReadS:
-        product = ProductOrm(**schema.model_dump())
-        self.session.add(product)
+        offers_state = await self._get_offers_state(
+            ProductOrm.product_code == any_(literal(list(offer_codes), ARRAY(String)))
+        ) if offer_codes else {}
+
+        values = [schema.model_dump() for schema in schemas]
+        values_by_code = {value["product_code"]: value for value in values}
+
+        # Возвращаем только то, что генерирует БД, остальное уже есть в values
+        stmt = insert(ProductOrm).values(values)
+        stmt = (
+            stmt.on_conflict_do_update(
+                index_elements=[ProductOrm.product_code],
+                set_={
+                    **{column: stmt.excluded[column] for column in values[0] if column != "product_code"},
+                    "updated_at": func.now(),
+                },
+            )
+            .returning(
+                ProductOrm.id,
+                ProductOrm.product_code,
+                ProductOrm.created_at,
+                ProductOrm.updated_at,
+                # xmax = 0 только у вставленной, а не обновленной строки
+                literal_column("xmax = 0").label("inserted"),
+            )
+        )
+
+        result = await self.session.execute(stmt)
+        # Данные уже провалидированы в ProductBaseS, повторная валидация не нужна
+        products = []
+        product_changes = []
+        for id, product_code, created_at, updated_at, inserted in result.all():
+            product = ProductReadS.model_construct(
+                **values_by_code[product_code], id=id, created_at=created_at, updated_at=updated_at
+            )
+            products.append(product)
+
+            if inserted:
+                product_changes.append(self._get_created_change(product))
+            else:
+                old_offers = offers_state[product_code][0] if product_code in offers_state else None
+                product_changes.append(
+                    self._get_updated_change(product, (changes or {}).get(product_code, {}), old_offers)
+                )
+
+        self._add_snapshots(products, price_codes=price_codes, offer_codes=offer_codes, offers_state=offers_state)
+        await self._add_price_rollups(price_codes)
+        await self._sync_seller_offers([product for product in products if product.product_code in offer_codes])
+        await self._add_changes(product_changes)
         await self.session.commit()
-        await self.session.refresh(product)
-        return ProductReadS.model_validate(product)
+
+        return products
     
-    async def get_by_product_code(self, product_code: str) -> Optional[ProductReadS]:
-        stmt = select(ProductOrm).where(ProductOrm.product_code == product_code)
+    @timed
+    async def get_by_product_code(
+        self, product_code: str, projection: type[Projection] = ProductReadS
+    ) -> Optional[Projection]:
+        """Читает только колонки из полей projection (ProductFreshnessS, ProductSummaryS, ProductOffersS, ProductReadS)."""
+        stmt = select(*self._get_columns(projection)).where(ProductOrm.product_code == product_code)
         result = await self.session.execute(stmt)
-        product = result.scalar_one_or_none()
-        if product is None:
+        row = result.one_or_none()
+        if row is None:
             return None
-        return ProductReadS.model_validate(product)
+        return projection.model_validate(row)
+
+    @timed
+    async def get_by_product_codes(
+        self, product_codes: list[str], projection: type[Projection] = ProductReadS
+    ) -> list[Projection]:
+        stmt = select(*self._get_columns(projection)).where(
+            ProductOrm.product_code == any_(literal(product_codes, ARRAY(String)))
+        )
+        result = await self.session.execute(stmt)
+        return [projection.model_validate(row) for row in result.all()]
+
+    @timed
+    async def get_updated_at_by_product_codes(self, product_codes: list[str]) -> dict[str, datetime]:
+        """Возвращает только product_code -> updated_at одним запросом на весь список."""
+        stmt = select(ProductOrm.product_code, ProductOrm.updated_at).where(
+            ProductOrm.product_code == any_(literal(product_codes, ARRAY(String)))
+        )
+        result = await self.session.execute(stmt)
+        return {product_code: updated_at for product_code, updated_at in result.all()}
 
-    async def update(self, id: UUID, diff: dict) -> ProductReadS:
+    async def iter_product_states(self, limit: int, batch_size: int = 10_000) -> AsyncIterator[Row]:
+        """
+        Скалярные поля и отпечатки limit самых недавно обновленных продуктов строками без pydantic,
+        читаются потоково пачками по batch_size. Для прогрева ProductStateCache.
+        """
+        stmt = (
+            select(*self._get_columns(ProductSummaryS))
+            .order_by(ProductOrm.updated_at.desc())
+            .limit(limit)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream(stmt)
+        async for row in result:
+            yield row
+
+    @timed
+    async def claim_due(self, limit: int, lease: timedelta) -> list[str]:
+        """
+        Забирает до limit продуктов, которым пора обновиться, и отодвигает им next_due_at на lease,
+        чтобы их не забрали повторно, пока они в работе. Возвращает ссылки продуктов.
+        """
+        due = (
+            select(ProductOrm.id)
+            .where(ProductOrm.next_due_at <= func.now(), ProductOrm.url.is_not(None))
+            .order_by(ProductOrm.next_due_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(ProductOrm)
+            .where(ProductOrm.id.in_(due))
+            .values(next_due_at=func.now() + lease, updated_at=ProductOrm.updated_at)
+            .returning(ProductOrm.url)
+        )
+
+        result = await self.session.execute(stmt)
+        urls = list(result.scalars())
+        await self.session.commit()
+
+        return urls
+
+    @timed
+    async def get_next_due_at(self) -> Optional[datetime]:
+        result = await self.session.execute(
+            select(func.min(ProductOrm.next_due_at)).where(ProductOrm.url.is_not(None))
+        )
+        return result.scalar_one_or_none()
+
+    @timed
+    async def reschedule(self, id: UUID, factor: float, min_interval: float, max_interval: float) -> None:
+        """Умножает интервал обновления на factor в пределах [min_interval, max_interval] минут."""
+        interval = func.least(max_interval, func.greatest(min_interval, ProductOrm.refresh_interval_minutes * factor))
         stmt = (
             update(ProductOrm)
             .where(ProductOrm.id == id)
-            .values(**diff)
-            .returning(ProductOrm)
+            .values(
+                refresh_interval_minutes=interval,
+                next_due_at=func.now() + literal(timedelta(minutes=1)) * interval,
+                updated_at=ProductOrm.updated_at,
+            )
+        )
+
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    @timed
+    async def get_price_history(self, product_ids: list[UUID]) -> dict[UUID, list[PriceSnapshotS]]:
+        stmt = (
+            select(PriceSnapshotOrm)
+            .where(PriceSnapshotOrm.product_id == any_(literal(product_ids, ARRAY(PgUUID(as_uuid=True)))))
+            .order_by(PriceSnapshotOrm.product_id, PriceSnapshotOrm.created_at, PriceSnapshotOrm.id)
+        )
+        result = await self.session.execute(stmt)
+
+        history = defaultdict(list)
+        for snapshot in result.scalars():
+            history[snapshot.product_id].append(
+                PriceSnapshotS(date=snapshot.created_at, min_price=snapshot.min_price, max_price=snapshot.max_price)
+            )
+        return history
+
+    @timed
+    async def get_offers_history(self, product_ids: list[UUID]) -> dict[UUID, list[OfferSnapshotS]]:
+        stmt = (
+            select(OfferSnapshotOrm)
+            .where(OfferSnapshotOrm.product_id == any_(literal(product_ids, ARRAY(PgUUID(as_uuid=True)))))
+            .order_by(OfferSnapshotOrm.product_id, OfferSnapshotOrm.created_at, OfferSnapshotOrm.id)
+        )
+        result = await self.session.execute(stmt)
+
+        # Полный список офферов восстанавливается применением разниц к опорным снимкам
+        history = defaultdict(list)
+        offers = []
+        for snapshot in result.scalars():
+            product_history = history[snapshot.product_id]
+            if not product_history:
+                offers = []
+            offers = self._apply_snapshot(offers, snapshot)
+            product_history.append(OfferSnapshotS(date=snapshot.created_at, offers=offers))
+        return history
+
+    @timed
+    async def get_offers_at(self, product_id: UUID, at: datetime) -> Optional[list[dict[str, Any]]]:
+        """Список офферов продукта на момент at: последний опорный снимок до at и разницы после него."""
+        keyframe_id = (
+            select(func.max(OfferSnapshotOrm.id))
+            .where(
+                OfferSnapshotOrm.product_id == product_id,
+                OfferSnapshotOrm.keyframe_distance == 0,
+                OfferSnapshotOrm.created_at <= at,
+            )
+            .scalar_subquery()
+        )
+        stmt = (
+            select(OfferSnapshotOrm)
+            .where(
+                OfferSnapshotOrm.product_id == product_id,
+                OfferSnapshotOrm.id >= keyframe_id,
+                OfferSnapshotOrm.created_at <= at,
+            )
+            .order_by(OfferSnapshotOrm.created_at, OfferSnapshotOrm.id)
+        )
+        result = await self.session.execute(stmt)
+
+        offers = None
+        for snapshot in result.scalars():
+            offers = self._apply_snapshot(offers or [], snapshot)
+        return offers
+
+    @timed
+    async def get_price_rollups(
+        self, product_ids: list[UUID], resolution: PriceResolution, start: datetime, end: datetime
+    ) -> dict[UUID, list[PriceRollupS]]:
+        """
+        Интервалы цен продуктов с start до end и последний интервал перед start,
+        от которого берется цена на начало ряда.
+        """
+        start = truncate(start, resolution)
+        previous = aliased(PriceRollupOrm)
+        first_bucket = func.coalesce(
+            select(func.max(previous.bucket_start))
+            .where(
+                previous.product_id == PriceRollupOrm.product_id,
+                previous.resolution == resolution,
+                previous.bucket_start < start,
+            )
+            .scalar_subquery(),
+            start,
+        )
+        stmt = (
+            select(PriceRollupOrm.product_id, *self._get_rollup_columns(PriceRollupOrm))
+            .where(
+                PriceRollupOrm.product_id == any_(literal(product_ids, ARRAY(PgUUID(as_uuid=True)))),
+                PriceRollupOrm.resolution == resolution,
+                PriceRollupOrm.bucket_start >= first_bucket,
+                PriceRollupOrm.bucket_start < end,
+            )
+            .order_by(PriceRollupOrm.product_id, PriceRollupOrm.bucket_start)
+        )
+        result = await self.session.execute(stmt)
+
+        rollups = defaultdict(list)
+        for row in result.all():
+            rollups[row.product_id].append(PriceRollupS.model_validate(row))
+        return rollups
+
+    @timed
+    async def get_category_price_rollups(
+        self, category: str, resolution: PriceResolution, start: datetime, end: datetime
+    ) -> list[PriceRollupS]:
+        start = truncate(start, resolution)
+        previous = aliased(CategoryPriceRollupOrm)
+        first_bucket = func.coalesce(
+            select(func.max(previous.bucket_start))
+            .where(
+                previous.category == category,
+                previous.resolution == resolution,
+                previous.bucket_start < start,
+            )
+            .scalar_subquery(),
+            start,
         )
+        stmt = (
+            select(*self._get_rollup_columns(CategoryPriceRollupOrm))
+            .where(
+                CategoryPriceRollupOrm.category == category,
+                CategoryPriceRollupOrm.resolution == resolution,
+                CategoryPriceRollupOrm.bucket_start >= first_bucket,
+                CategoryPriceRollupOrm.bucket_start < end,
+            )
+            .order_by(CategoryPriceRollupOrm.bucket_start)
+        )
+        result = await self.session.execute(stmt)
+        return [PriceRollupS.model_validate(row) for row in result.all()]
+
+    @timed
+    async def get_seller_offers(
+        self, seller: str, max_rank: Optional[int] = None, limit: int = 1000, offset: int = 0
+    ) -> list[SellerOfferS]:
+        """
+        Текущие офферы продавца по возрастанию цены. max_rank=1 - продукты, где продавец самый дешевый.
+        Читается индекс seller_offers и скалярные колонки products, offers не разбираются.
+        """
+        stmt = (
+            select(
+                SellerOfferOrm.product_id,
+                ProductOrm.product_code,
+                ProductOrm.name,
+                SellerOfferOrm.price,
+                SellerOfferOrm.rank,
+                ProductOrm.sellers_count,
+                SellerOfferOrm.updated_at,
+            )
+            .join(ProductOrm, ProductOrm.id == SellerOfferOrm.product_id)
+            .where(SellerOfferOrm.seller == seller)
+            .order_by(SellerOfferOrm.price, SellerOfferOrm.product_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        if max_rank is not None:
+            stmt = stmt.where(SellerOfferOrm.rank <= max_rank)
 
         result = await self.session.execute(stmt)
-        updated_row = result.scalar_one()
+        return [SellerOfferS.model_validate(row) for row in result.all()]
+
+    @timed
+    async def get_seller_offers_count(self, seller: str) -> dict[int, int]:
+        """Сколько продуктов продавца на каждом месте по цене."""
+        stmt = (
+            select(SellerOfferOrm.rank, func.count())
+            .where(SellerOfferOrm.seller == seller)
+            .group_by(SellerOfferOrm.rank)
+            .order_by(SellerOfferOrm.rank)
+        )
+        result = await self.session.execute(stmt)
+        return {rank: count for rank, count in result.all()}
+
+    @timed
+    async def get_changes(self, after: ChangeOffset = (0, 0), limit: int = 1000) -> list[ProductChangeS]:
+        """
+        События после after по возрастанию (xact_id, id). Отдаются только события транзакций старше
+        самой старой незавершенной: более ранняя транзакция еще может закоммитить события перед ними.
+        """
+        visible_before = func.pg_snapshot_xmin(func.pg_current_snapshot()).cast(Text).cast(BigInteger)
+        # Без явного типа позиция уходит как int4, а xact_id и id - bigint
+        offset = tuple_(literal(after[0], BigInteger), literal(after[1], BigInteger))
+        stmt = (
+            select(ProductChangeOrm)
+            .where(
+                tuple_(ProductChangeOrm.xact_id, ProductChangeOrm.id) > offset,
+                ProductChangeOrm.xact_id < visible_before,
+            )
+            .order_by(ProductChangeOrm.xact_id, ProductChangeOrm.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return [ProductChangeS.model_validate(change) for change in result.scalars()]
+
+    @timed
+    async def delete_changes_before(self, before: datetime) -> int:
+        result = await self.session.execute(delete(ProductChangeOrm).where(ProductChangeOrm.created_at < before))
         await self.session.commit()
+        return result.rowcount
+
+    def _get_created_change(self, product: ProductReadS) -> Optional[ProductChangeOrm]:
+        if not self.change_feed:
+            return None
+
+        changes = get_field_changes(
+            None, {field: getattr(product, field) for field in TRACKED_FIELDS if getattr(product, field) is not None}
+        )
+        if offers := get_offers_changes([], product.offers):
+            changes["offers"] = offers
+        return ProductChangeOrm(product_id=product.id, product_code=product.product_code, kind="created", changes=changes)
+
+    def _get_updated_change(
+        self, product: ProductReadS, changes: dict, old_offers: Optional[list[dict[str, Any]]]
+    ) -> Optional[ProductChangeOrm]:
+        if not self.change_feed:
+            return None
+
+        changes = dict(changes)
+        if old_offers is not None and (offers := get_offers_changes(old_offers, product.offers)):
+            changes["offers"] = offers
+        if not changes:
+            return None
+        return ProductChangeOrm(product_id=product.id, product_code=product.product_code, kind="updated", changes=changes)
+
+    async def _add_changes(self, changes: list[Optional[ProductChangeOrm]]) -> None:
+        """События пишутся в транзакции изменения, NOTIFY доставляется слушателям после ее коммита."""
+        changes = [change for change in changes if change is not None]
+        if not changes:
+            return
+
+        self.session.add_all(changes)
+        await self.session.execute(select(func.pg_notify(CHANGES_CHANNEL, str(len(changes)))))
+
+    async def _sync_seller_offers(self, products: list[ProductReadS]) -> None:
+        """
+        Приводит строки seller_offers продуктов к их текущим офферам: ушедшие продавцы удаляются,
+        перезаписываются только строки с другой ценой или местом.
+        """
+        if not products:
+            return
+
+        product_ids, sellers, prices, ranks = [], [], [], []
+        for product in products:
+            for seller, (price, rank) in get_seller_ranks(product.offers).items():
+                product_ids.append(product.id)
+                sellers.append(seller)
+                prices.append(float(price))
+                ranks.append(rank)
+
+        uuid_array = ARRAY(PgUUID(as_uuid=True))
+        current = select(
+            func.unnest(literal(product_ids, uuid_array)),
+            func.unnest(literal(sellers, ARRAY(String))),
+        )
+        await self.session.execute(
+            delete(SellerOfferOrm).where(
+                SellerOfferOrm.product_id == any_(literal([product.id for product in products], uuid_array)),
+                tuple_(SellerOfferOrm.product_id, SellerOfferOrm.seller).not_in(current),
+            )
+        )
+        if not product_ids:
+            return
+
+        stmt = insert(SellerOfferOrm).from_select(
+            ["product_id", "seller", "price", "rank"],
+            select(
+                func.unnest(literal(product_ids, uuid_array)),
+                func.unnest(literal(sellers, ARRAY(String))),
+                func.unnest(literal(prices, ARRAY(Float))),
+                func.unnest(literal(ranks, ARRAY(Integer))),
+            ),
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SellerOfferOrm.product_id, SellerOfferOrm.seller],
+                set_={"price": stmt.excluded.price, "rank": stmt.excluded.rank, "updated_at": func.now()},
+                where=or_(SellerOfferOrm.price != stmt.excluded.price, SellerOfferOrm.rank != stmt.excluded.rank),
+            )
+        )
+
+    async def _add_price_rollups(self, price_codes: Collection[str]) -> None:
+        """
+        Дописывает цены продуктов из price_codes и их категорий в часовые и дневные интервалы.
+        Цены берутся из уже записанных строк products. Новый интервал учитывает close предыдущего:
+        до первого изменения в интервале действовала прежняя цена.
+        """
+        if not price_codes:
+            return
+
+        resolutions = values(column("resolution", String), name="resolutions", literal_binds=True).data(
+            [(resolution,) for resolution in RESOLUTIONS]
+        )
+        condition = ProductOrm.product_code == any_(literal(list(price_codes), ARRAY(String)))
+
+        previous = aliased(PriceRollupOrm)
+        products = (
+            select(
+                ProductOrm.id.label("product_id"),
+                resolutions.c.resolution,
+                ProductOrm.min_price,
+                ProductOrm.max_price,
+                *self._get_previous_close(previous, previous.product_id == ProductOrm.id, resolutions),
+            )
+            .join(resolutions, true())
+            .where(condition)
+            .subquery()
+        )
+        await self._upsert_rollups(
+            PriceRollupOrm, products, "product_id", update_extra={"changes": PriceRollupOrm.changes + 1}
+        )
+
+        # Текущие min/max категории, включая только что записанные продукты. Каждое значение - один шаг
+        # по индексу (category, min_price)/(category, max_price), остальные продукты категории не читаются
+        touched = (
+            select(ProductOrm.category)
+            .where(condition, ProductOrm.category.is_not(None))
+            .distinct()
+            .subquery()
+        )
+        other = aliased(ProductOrm)
+        current = (
+            select(
+                touched.c.category,
+                select(func.min(other.min_price)).where(other.category == touched.c.category)
+                .scalar_subquery().label("min_price"),
+                select(func.max(other.max_price)).where(other.category == touched.c.category)
+                .scalar_subquery().label("max_price"),
+            )
+            .subquery()
+        )
+        previous = aliased(CategoryPriceRollupOrm)
+        categories = (
+            select(
+                current.c.category,
+                resolutions.c.resolution,
+                current.c.min_price,
+                current.c.max_price,
+                *self._get_previous_close(previous, previous.category == current.c.category, resolutions),
+            )
+            .join(resolutions, true())
+            # Строки категорий блокируются в одном порядке, чтобы параллельные записи не взаимоблокировались
+            .order_by(current.c.category, resolutions.c.resolution)
+            .subquery()
+        )
+        await self._upsert_rollups(CategoryPriceRollupOrm, categories, "category")
+
+    @staticmethod
+    def _get_previous_close(previous: Any, condition: ColumnElement[bool], resolutions: Any) -> list[ColumnElement]:
+        """close последнего интервала той же строки, LEAST/GREATEST в Postgres пропускают NULL первого интервала."""
+        def get_close(column: ColumnElement) -> ColumnElement:
+            return (
+                select(column)
+                .where(condition, previous.resolution == resolutions.c.resolution)
+                .order_by(previous.bucket_start.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+
+        return [
+            get_close(previous.close_min_price).label("previous_min_price"),
+            get_close(previous.close_max_price).label("previous_max_price"),
+        ]
+
+    async def _upsert_rollups(
+        self,
+        table: Any,
+        source: Subquery,
+        key: str,
+        update_extra: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """Вставляет интервалы из source, в существующих расширяет min/max и заменяет close."""
+        rows = select(
+            source.c[key],
+            source.c.resolution,
+            func.date_trunc(source.c.resolution, func.now(), "UTC"),
+            func.least(source.c.min_price, source.c.previous_min_price),
+            func.greatest(source.c.max_price, source.c.previous_max_price),
+            source.c.min_price,
+            source.c.max_price,
+        )
+        stmt = insert(table).from_select(
+            [key, "resolution", "bucket_start", "min_price", "max_price", "close_min_price", "close_max_price"],
+            rows,
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[getattr(table, key), table.resolution, table.bucket_start],
+                set_={
+                    "min_price": func.least(table.min_price, stmt.excluded.min_price),
+                    "max_price": func.greatest(table.max_price, stmt.excluded.max_price),
+                    "close_min_price": stmt.excluded.close_min_price,
+                    "close_max_price": stmt.excluded.close_max_price,
+                    **(update_extra or {}),
+                },
+            )
+        )
+
+    async def _get_offers_state(self, condition: ColumnElement[bool]) -> dict[str, OffersState]:
+        """
+        Текущие офферы продуктов и keyframe_distance их последнего снимка, нужны для записи разницы.
+        Строки продуктов блокируются до коммита в порядке product_code, чтобы параллельная запись
+        не построила разницу от того же снимка.
+        """
+        keyframe_distance = (
+            select(OfferSnapshotOrm.keyframe_distance)
+            .where(OfferSnapshotOrm.product_id == ProductOrm.id)
+            .order_by(OfferSnapshotOrm.created_at.desc(), OfferSnapshotOrm.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(ProductOrm.product_code, ProductOrm.offers, keyframe_distance)
+            .where(condition)
+            .order_by(ProductOrm.product_code)
+            .with_for_update(of=ProductOrm)
+        )
+        result = await self.session.execute(stmt)
+        return {product_code: (offers, distance) for product_code, offers, distance in result.all()}
+
+    @staticmethod
+    def _get_columns(projection: type[BaseModel]) -> list[ColumnElement]:
+        return [getattr(ProductOrm, field) for field in projection.model_fields]
+
+    @staticmethod
+    def _get_rollup_columns(table: Any) -> list[ColumnElement]:
+        return [getattr(table, field) for field in PriceRollupS.model_fields]
+
+    @staticmethod
+    def _apply_snapshot(offers: list[dict[str, Any]], snapshot: OfferSnapshotOrm) -> list[dict[str, Any]]:
+        if snapshot.offers is not None:
+            return snapshot.offers
+        return apply_offers_delta(offers, snapshot.delta)
+
+    def _make_offer_snapshot(self, product: ProductReadS, state: Optional[OffersState]) -> Optional[OfferSnapshotOrm]:
+        """Разница с предыдущим снимком, а каждый offers_keyframe_interval снимок - полный список."""
+        if state is not None:
+            offers, distance = state
+            if distance is not None and distance + 1 < self.offers_keyframe_interval:
+                delta = get_offers_delta(offers, product.offers)
+                if delta == {}:
+                    # Изменился только порядок офферов, снимок не нужен
+                    return None
+                if delta is not None:
+                    return OfferSnapshotOrm(product_id=product.id, delta=delta, keyframe_distance=distance + 1)
+
+        return OfferSnapshotOrm(product_id=product.id, offers=product.offers, keyframe_distance=0)
 
-        return ProductReadS.model_validate(updated_row)
\ No newline at end of file
+    def _add_snapshots(
+        self,
+        products: list[ProductReadS],
+        price_codes: Collection[str],
+        offer_codes: Collection[str],
+        offers_state: Optional[dict[str, OffersState]] = None,
+    ) -> None:
+        """История только дописывается новыми строками, старые снимки не перезаписываются."""
+        for product in products:
+            if product.product_code in price_codes:
+                self.session.add(
+                    PriceSnapshotOrm(product_id=product.id, min_price=product.min_price, max_price=product.max_price)
+                )
+            if product.product_code in offer_codes:
+                snapshot = self._make_offer_snapshot(product, (offers_state or {}).get(product.product_code))
+                if snapshot is not None:
+                    self.session.add(snapshot)
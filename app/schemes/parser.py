@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -12,4 +14,13 @@ class DataFromHtmlS(BaseModel):
 
 class ReviewsS(BaseModel):
     rating: float
-    comments: int
\ No newline at end of file
+    comments: int
+
+class ProductPageS(BaseModel):
+    url: str
+    product_code: str
+    content: bytes
+    encoding: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    item_hash: Optional[str]
\ No newline at end of file
@@ -1,31 +1,123 @@
 from datetime import datetime
+from typing import Literal, Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ProductBaseS(BaseModel):
     product_code: str
     name: str
+    url: Optional[str] = None
+    category: Optional[str] = None
     min_price: float
     max_price: float
     rating: float
     comments_count: int
 
-    price_history: list[dict]
-
     image_links: list[str]
 
     details: dict
     offers: list[dict]
 
-    offers_history: list[dict]
-
     sellers_count: int
 
+    # Отпечатки вложенных полей (app.utils.fingerprint), чтобы сравнивать их без обхода структур
+    fingerprints: dict[str, str] = Field(default_factory=dict)
+
     model_config = ConfigDict(from_attributes=True)
 
 class ProductReadS(ProductBaseS):
     id: UUID
 
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+# Проекции продукта для чтения только нужных колонок, поля совпадают с колонками ProductOrm
+
+class ProductFreshnessS(BaseModel):
+    id: UUID
+    product_code: str
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductSummaryS(BaseModel):
+    """Все, кроме тяжелых JSONB полей: вложенные поля сравниваются по fingerprints."""
+    id: UUID
+    product_code: str
+    name: str
+    url: Optional[str] = None
+    category: Optional[str] = None
+    min_price: float
+    max_price: float
+    rating: float
+    comments_count: int
+    sellers_count: int
+    fingerprints: dict[str, str] = Field(default_factory=dict)
+
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProductOffersS(BaseModel):
+    id: UUID
+    product_code: str
+    min_price: float
+    max_price: float
+    sellers_count: int
+    offers: list[dict]
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class PriceSnapshotS(BaseModel):
+    date: datetime
+    min_price: float
+    max_price: float
+
+# Интервал ряда цен: hour или day
+PriceResolution = Literal["hour", "day"]
+
+class PriceRollupS(BaseModel):
+    bucket_start: datetime
+    min_price: float
+    max_price: float
+    close_min_price: float
+    close_max_price: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SellerOfferS(BaseModel):
+    """Оффер продавца с данными продукта для запросов по продавцу."""
+    product_id: UUID
+    product_code: str
+    name: str
+    price: float
+    rank: int
+    sellers_count: int
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Позиция в ленте изменений: (xact_id, id) последнего прочитанного события
+ChangeOffset = tuple[int, int]
+
+class ProductChangeS(BaseModel):
+    id: int
+    xact_id: int
+    product_id: UUID
+    product_code: str
+    kind: str
+    changes: dict
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @property
+    def offset(self) -> ChangeOffset:
+        return (self.xact_id, self.id)
+
+class OfferSnapshotS(BaseModel):
+    date: datetime
+    offers: list[dict]
\ No newline at end of file
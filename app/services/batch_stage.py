@@ -0,0 +1,70 @@
+import asyncio
+from typing import Generic, Optional, TypeVar
+
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+S = TypeVar("S", bound="BatchStage")
+
+
+class BatchStage(Generic[T]):
+    """
+    Основа write-behind стадий: элементы копятся в очереди, фоновая задача отдает их в _flush пачками.
+    Пачка ограничена размером batch_size и временем flush_interval. Ошибки пачки _flush обрабатывает сам.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, queue: str) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: asyncio.Queue[T] = asyncio.Queue(maxsize=batch_size * 2)
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.gauge("kaspi_queue_size", self._queue.qsize, queue=queue)
+
+    async def __aenter__(self: S) -> S:
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Дожидается обработки всего, что уже в очереди, и останавливает стадию."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _put(self, item: T) -> None:
+        await self._queue.put(item)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[T]) -> None:
+        raise NotImplementedError
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import math
+import time
+from typing import AsyncIterator, Iterable, Iterator, Literal, NamedTuple, Optional
+
+from app.services.listing_state import ListingState
+from app.services.parser_service import LISTING_ENDPOINT, KaspiScraper
+from app.utils.metrics import metrics, timed
+from app.utils.product_url import ProductUrl, parse_product_url
+
+logger = logging.getLogger(__name__)
+
+LISTING_URL = "https://kaspi.kz/yml/product-view/pl/results"
+
+# Листинг запрашивается от новых товаров к старым: новые товары появляются на первых страницах,
+# поэтому при повторном обходе можно остановиться на первой неизменившейся странице
+LISTING_SORT = "new"
+
+
+class Listing(NamedTuple):
+    kind: Literal["category", "search"]
+    value: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.value}"
+
+
+class ListingPage(NamedTuple):
+    page: int
+    total: int
+    products: list[ProductUrl]
+
+
+class ListingCrawler:
+    """
+    Находит товары в категориях и поиске Kaspi: страницы листинга запрашиваются параллельно
+    через клиент и rate limiter KaspiScraper, из них достаются канонические ссылки на товары.
+
+    Повторный обход идет до первой страницы, на которой все товары уже известны: листинг отсортирован
+    от новых к старым, дальше новых товаров нет. Раз в full_rescan_seconds листинг обходится целиком,
+    чтобы найти товары, которые попали глубже первых страниц.
+    """
+
+    def __init__(
+        self,
+        scraper: KaspiScraper,
+        city_id: str,
+        concurrency: int,
+        max_pages: int,
+        full_rescan_seconds: float,
+        state: Optional[ListingState] = None,
+    ) -> None:
+        self.scraper = scraper
+        self.city_id = city_id
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.full_rescan_seconds = full_rescan_seconds
+        self.state = state
+
+    @timed
+    async def get_listing_page(self, listing: Listing, page: int) -> ListingPage:
+        params = {"page": page, "sort": LISTING_SORT, "c": self.city_id}
+        if listing.kind == "category":
+            params["q"] = f":category:{listing.value}"
+        else:
+            params["text"] = listing.value
+
+        resp = await self.scraper.rate_limiter.request(
+            LISTING_ENDPOINT, lambda: self.scraper.client.get(LISTING_URL, params=params)
+        )
+
+        if resp.status_code != 200:
+            raise RuntimeError(f"Error getting listing page: {resp.status_code}")
+
+        data = resp.json()
+        return ListingPage(page=page, total=data["total"], products=self.get_products(data["data"]))
+
+    def get_products(self, cards: list[dict]) -> list[ProductUrl]:
+        products = []
+        for card in cards:
+            link = card.get("shopLink") or f"/shop/p/{card['id']}/"
+            product_url = parse_product_url(f"https://kaspi.kz{link}?c={self.city_id}")
+            if product_url is None:
+                logger.warning("Invalid listing product link", extra={"link": link})
+                continue
+            products.append(product_url)
+        return products
+
+    async def discover(self, listings: Iterable[Listing]) -> AsyncIterator[ProductUrl]:
+        """
+        Ссылки на товары всех листингов, которых не было в прошлых обходах, без повторов и по мере загрузки страниц.
+        Товары, найденные раньше, отдает iter_known.
+        """
+        seen: set[int] = set()
+
+        for listing in listings:
+            try:
+                async for product_url in self.crawl(listing):
+                    code = int(product_url.product_code)
+                    if code not in seen:
+                        seen.add(code)
+                        yield product_url
+            except Exception as e:
+                # Недоступный листинг не должен останавливать обход остальных
+                logger.error("Error during listing crawl", extra={"listing": listing.key, "error": str(e)})
+
+    def iter_known(self) -> Iterator[ProductUrl]:
+        """Товары, найденные в прошлые обходы, без запросов к Kaspi."""
+        if self.state is not None:
+            yield from self.state.iter_products()
+
+    async def crawl(self, listing: Listing) -> AsyncIterator[ProductUrl]:
+        state = self.state.get(listing.key) if self.state else None
+        full_scan = state is None or time.time() - state.scanned_at > self.full_rescan_seconds
+
+        first_page = await self.get_listing_page(listing, 0)
+        pages_count = min(self.max_pages, math.ceil(first_page.total / max(1, len(first_page.products))))
+
+        walked = 1
+        new_products = self.save_page(first_page)
+        done = self.is_known(new_products, full_scan)
+        for product_url in new_products:
+            yield product_url
+
+        # Страницы запрашиваются окнами по concurrency, после окна с полностью известной страницей обход заканчивается
+        page = 1
+        while not done and page < pages_count:
+            window = range(page, min(page + self.concurrency, pages_count))
+            pages = await asyncio.gather(*(self.get_listing_page(listing, number) for number in window))
+
+            for listing_page in pages:
+                new_products = self.save_page(listing_page)
+                done = done or self.is_known(new_products, full_scan)
+                for product_url in new_products:
+                    yield product_url
+
+            walked += len(pages)
+            page += self.concurrency
+
+        if self.state is not None:
+            self.state.put(listing.key, first_page.total, full_scan)
+
+        metrics.inc("kaspi_listing_pages_total", walked, kind=listing.kind)
+        logger.info(
+            "Listing crawled",
+            extra={"listing": listing.key, "total": first_page.total, "pages": pages_count, "walked": walked, "full_scan": full_scan},
+        )
+
+    def is_known(self, new_products: list[ProductUrl], full_scan: bool) -> bool:
+        """Все товары страницы уже были в прошлых обходах."""
+        if full_scan or self.state is None:
+            return False
+        return not new_products
+
+    def save_page(self, listing_page: ListingPage) -> list[ProductUrl]:
+        """Запоминает товары страницы и возвращает те, которых не было в прошлых обходах."""
+        if self.state is None:
+            return listing_page.products
+
+        known = self.state.get_known(listing_page.products)
+        self.state.put_products(listing_page.products)
+        return [product for product in listing_page.products if int(product.product_code) not in known]
@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+from typing import IO, Optional
+
+from app.schemes.product import OfferSnapshotS, PriceSnapshotS, ProductReadS
+
+
+class JsonlWriter:
+    """
+    Пишет JSON Lines во временный файл рядом с path.
+    При успешном закрытии атомарно подменяет path, при ошибке старый файл остается нетронутым.
+    """
+
+    def __init__(self, path: Path, compact: bool = True) -> None:
+        self.path = path
+        self.tmp_path = path.with_name(f".{path.name}.tmp")
+        self.separators = (",", ":") if compact else (", ", ": ")
+        self._file: Optional[IO[str]] = None
+
+    def __enter__(self) -> "JsonlWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.tmp_path.open("w", encoding="utf-8")
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+    def write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=self.separators))
+        self._file.write("\n")
+
+
+class ExportService:
+    """Потоковый экспорт: каждый продукт пишется отдельной строкой сразу после обработки."""
+
+    def __init__(self, export_dir: Path, compact: bool = True) -> None:
+        self.products = JsonlWriter(export_dir / "products.jsonl", compact)
+        self.offers = JsonlWriter(export_dir / "offers.jsonl", compact)
+        self.skipped_urls = JsonlWriter(export_dir / "skipped_urls.jsonl", compact)
+
+    def __enter__(self) -> "ExportService":
+        for writer in (self.products, self.offers, self.skipped_urls):
+            writer.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for writer in (self.products, self.offers, self.skipped_urls):
+            writer.__exit__(*exc)
+
+    def rotate(self) -> None:
+        """Публикует накопленные файлы и начинает новые, для режима без конца цикла."""
+        self.__exit__(None, None, None)
+        self.__enter__()
+
+    def write_product(
+        self,
+        url: str,
+        product: ProductReadS,
+        price_history: list[PriceSnapshotS],
+        offers_history: list[OfferSnapshotS],
+    ) -> None:
+        self.products.write(
+            {
+                "url": url,
+                **product.model_dump(mode="json", exclude={"id", "created_at", "updated_at", "offers", "fingerprints", "category"}),
+                "price_history": [snapshot.model_dump(mode="json") for snapshot in price_history],
+            }
+        )
+        self.offers.write(
+            {
+                "url": url,
+                "offers": product.offers,
+                "offers_history": [snapshot.model_dump(mode="json") for snapshot in offers_history],
+            }
+        )
+
+    def write_skipped(self, url: str, error: str) -> None:
+        self.skipped_urls.write({"url": url, "error": error})
@@ -0,0 +1,82 @@
+from pathlib import Path
+import sqlite3
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from app.utils.product_url import ProductUrl
+
+
+class ListingStateEntry(NamedTuple):
+    total: int
+    scanned_at: float
+
+
+class ListingState:
+    """
+    Состояние прошлых обходов листингов в SQLite: все найденные товары и время последнего полного обхода
+    каждого листинга. По известным товарам повторный обход понимает, где начинаются уже виденные страницы.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS listings (
+                listing TEXT PRIMARY KEY,
+                total INTEGER NOT NULL,
+                scanned_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                product_code INTEGER PRIMARY KEY,
+                url TEXT NOT NULL
+            )
+            """
+        )
+
+    def get(self, listing: str) -> Optional[ListingStateEntry]:
+        row = self.connection.execute(
+            "SELECT total, scanned_at FROM listings WHERE listing = ?", (listing,)
+        ).fetchone()
+        if row is None:
+            return None
+        return ListingStateEntry(*row)
+
+    def put(self, listing: str, total: int, full_scan: bool) -> None:
+        """scanned_at обновляется только после полного обхода, по нему решается, когда обходить заново целиком."""
+        self.connection.execute(
+            """
+            INSERT INTO listings (listing, total, scanned_at) VALUES (?, ?, ?)
+            ON CONFLICT (listing) DO UPDATE SET
+                total = excluded.total,
+                scanned_at = CASE WHEN ? THEN excluded.scanned_at ELSE listings.scanned_at END
+            """,
+            (listing, total, time.time(), full_scan),
+        )
+
+    def get_known(self, products: list[ProductUrl]) -> set[int]:
+        """Коды товаров из products, найденных в прошлые обходы."""
+        if not products:
+            return set()
+        placeholders = ",".join("?" * len(products))
+        rows = self.connection.execute(
+            f"SELECT product_code FROM products WHERE product_code IN ({placeholders})",
+            [int(product.product_code) for product in products],
+        )
+        return {product_code for product_code, in rows}
+
+    def put_products(self, products: Iterable[ProductUrl]) -> None:
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO products (product_code, url) VALUES (?, ?)",
+            ((int(product.product_code), product.url) for product in products),
+        )
+
+    def iter_products(self) -> Iterator[ProductUrl]:
+        """Все товары, найденные в листингах за все обходы."""
+        for product_code, url in self.connection.execute("SELECT product_code, url FROM products"):
+            yield ProductUrl(str(product_code), url)
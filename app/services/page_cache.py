@@ -0,0 +1,145 @@
+import logging
+from pathlib import Path
+import sqlite3
+import time
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PageCacheEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    item_hash: str
+    stored_at: float
+
+
+class PageCache:
+    """
+    Локальный кеш страниц товаров: ETag/Last-Modified и хеш BACKEND.components.item по product_code.
+    Хранится в SQLite на диске, ограничен max_entries с вытеснением давно не использованных (LRU).
+    Записи старше max_age_seconds считаются отсутствующими, чтобы продукт периодически парсился полностью.
+
+    Методы вызываются прямо из event loop, поэтому изменения коммитятся пачками: раз в commit_every записей
+    или commit_seconds секунд. При падении теряются только последние записи кеша, продукты просто спарсятся заново.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int,
+        max_age_seconds: float,
+        commit_every: int = 1000,
+        commit_seconds: float = 5.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.commit_every = commit_every
+        self.commit_seconds = commit_seconds
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # С WAL и пачечными коммитами fsync на каждый коммит не нужен
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                product_code TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                item_hash TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS ix_pages_accessed_at ON pages (accessed_at)")
+        self.connection.commit()
+
+        self._size = self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        self._pending = 0
+        self._committed_at = time.monotonic()
+
+    def get(self, product_code: str) -> Optional[PageCacheEntry]:
+        row = self.connection.execute(
+            "SELECT etag, last_modified, item_hash, stored_at FROM pages WHERE product_code = ?",
+            (product_code,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        entry = PageCacheEntry(*row)
+        if time.time() - entry.stored_at > self.max_age_seconds:
+            return None
+
+        self.touch(product_code)
+        return entry
+
+    def touch(self, product_code: str) -> None:
+        self.connection.execute(
+            "UPDATE pages SET accessed_at = ? WHERE product_code = ?", (time.time(), product_code)
+        )
+        self._written()
+
+    def put(
+        self,
+        product_code: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        item_hash: str,
+        stored_at: Optional[float] = None,
+    ) -> None:
+        now = time.time()
+        exists = self.connection.execute(
+            "SELECT 1 FROM pages WHERE product_code = ?", (product_code,)
+        ).fetchone() is not None
+
+        self.connection.execute(
+            """
+            INSERT INTO pages (product_code, etag, last_modified, item_hash, stored_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (product_code) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                item_hash = excluded.item_hash,
+                stored_at = excluded.stored_at,
+                accessed_at = excluded.accessed_at
+            """,
+            (product_code, etag, last_modified, item_hash, stored_at or now, now),
+        )
+
+        if not exists:
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+
+        self._written()
+
+    def commit(self) -> None:
+        self.connection.commit()
+        self._pending = 0
+        self._committed_at = time.monotonic()
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= self.commit_every or time.monotonic() - self._committed_at >= self.commit_seconds:
+            self.commit()
+
+    def _evict(self) -> None:
+        # Удаляем давно не использованные записи с запасом в 10%, чтобы не вытеснять на каждой вставке
+        count = self._size - int(self.max_entries * 0.9)
+        self.connection.execute(
+            """
+            DELETE FROM pages WHERE product_code IN (
+                SELECT product_code FROM pages ORDER BY accessed_at LIMIT ?
+            )
+            """,
+            (count,),
+        )
+        self._size = self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        logger.info("Page cache evicted", extra={"evicted": count, "size": self._size})
@@ -1,67 +1,150 @@
 import asyncio
-import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+import hashlib
 import logging
+import math
 import random
 import pathlib
+import time
+from typing import Optional
 
 import httpx
-from fake_useragent import UserAgent
 
-from app.schemes.parser import DataFromHtmlS, ReviewsS
+from app.core.settings import BASE_DIR, settings
+from app.schemes.parser import DataFromHtmlS, ProductPageS, ReviewsS
 from app.schemes.product import ProductBaseS
-from app.services.product_service import ProductService
+from app.services.page_cache import PageCache
+from app.services.rate_limiter import RateLimiter
+from app.utils.json_extractor import extract_json_object
+from app.utils.fingerprint import get_fingerprints
+from app.utils.metrics import metrics, timed
+from app.utils.product_url import parse_product_url
+from app.utils.tasks import gather_or_cancel
 
 logger = logging.getLogger(__name__)
 
-ua = UserAgent()
+
+@cache
+def get_user_agent() -> str:
+    """Случайный User-Agent на процесс, база fake_useragent загружается только при создании клиента."""
+    from fake_useragent import UserAgent
+
+    return UserAgent().random
+
+# Сколько офферов отдает offer-view за одну страницу
+OFFERS_PAGE_LIMIT = 60
+
+# Endpoint'ы Kaspi, у каждого свой лимит запросов
+PRODUCT_PAGE_ENDPOINT = "product_page"
+REVIEWS_ENDPOINT = "review_view"
+OFFERS_ENDPOINT = "offer_view"
+LISTING_ENDPOINT = "listing"
+
+# Переменная страницы товара, в которой лежат его данные
+ITEM_MARKER = "BACKEND.components.item"
+
+# Ключи BACKEND.components.item, которые нужны для DataFromHtmlS
+ITEM_KEYS = ("card", "breadcrumbs", "specifications", "galleryImages")
 
 
 class KaspiScraper:
     def __init__(self):
-        self.client = httpx.AsyncClient(
-            headers={
-                "User-Agent": ua.random,
-                "Host": "kaspi.kz",
-                "X-Ks-City": "750000000",
-            }
+        # Клиент создается при первом запросе: без него импорт и запуск утилит не тратят время на TLS и HTTP/2
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.rate_limiter = RateLimiter(
+            endpoints=[PRODUCT_PAGE_ENDPOINT, REVIEWS_ENDPOINT, OFFERS_ENDPOINT, LISTING_ENDPOINT],
+            rate=settings.rate_limit.RATE_PER_SECOND,
+            burst=settings.rate_limit.BURST,
+            min_rate=settings.rate_limit.MIN_RATE_PER_SECOND,
+            max_rate=settings.rate_limit.MAX_RATE_PER_SECOND,
+            increase_step=settings.rate_limit.INCREASE_STEP,
+            decrease_factor=settings.rate_limit.DECREASE_FACTOR,
+            max_retries=settings.rate_limit.MAX_RETRIES,
+            backoff_base=settings.rate_limit.BACKOFF_BASE_SECONDS,
+            backoff_max=settings.rate_limit.BACKOFF_MAX_SECONDS,
         )
 
+        # Пул процессов для разбора страниц создается при первом использовании
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+
+        self.page_cache = None
+        if settings.page_cache.ENABLED:
+            self.page_cache = PageCache(
+                path=BASE_DIR / settings.page_cache.PATH,
+                max_entries=settings.page_cache.MAX_ENTRIES,
+                max_age_seconds=settings.page_cache.MAX_AGE_MINUTES * 60,
+            )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Общие заголовки задаются один раз, Referer/Origin передаются в каждый запрос,
+            # чтобы параллельные продукты не перетирали заголовки друг друга
+            self._client = httpx.AsyncClient(
+                headers={
+                    "User-Agent": get_user_agent(),
+                    "Host": "kaspi.kz",
+                    "X-Ks-City": "750000000",
+                },
+                http2=settings.http.HTTP2,
+                timeout=httpx.Timeout(
+                    settings.http.TIMEOUT_SECONDS,
+                    connect=settings.http.CONNECT_TIMEOUT_SECONDS,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.http.MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.http.MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.http.KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            )
+        return self._client
+
+    @client.setter
+    def client(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+
+    async def aclose(self) -> None:
+        """Закрывает HTTP клиент, кеш страниц и останавливает пул процессов разбора, если они были созданы."""
+        if self.page_cache is not None:
+            self.page_cache.close()
+            self.page_cache = None
+
+        if self.process_pool is not None:
+            self.process_pool.shutdown(cancel_futures=True)
+            self.process_pool = None
+
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     @staticmethod
     def get_product_code_from_url(url: str) -> str:
+        product_url = parse_product_url(url)
+        if product_url is not None:
+            return product_url.product_code
         return url.split("/")[-2].split("-")[-1]
 
-    async def get_product_page_html(self, url: str) -> str:
-        resp = await self.client.get(url)
+    @timed
+    async def get_product_page(self, url: str, headers: Optional[dict] = None) -> httpx.Response:
+        return await self.rate_limiter.request(PRODUCT_PAGE_ENDPOINT, lambda: self.client.get(url, headers=headers))
 
-        if resp.status_code != 200:
-            raise RuntimeError(f"Error getting product page: {resp.status_code}")
-
-        return resp.text
-
-    def get_product_data_from_html(self, html: str) -> DataFromHtmlS:
-        # Находим место, где начинается JSON
-        start = html.find("BACKEND.components.item")
+    @staticmethod
+    def get_item_hash(content: bytes) -> str:
+        """Хеш BACKEND.components.item без декодирования и разбора JSON: от маркера до конца тега script."""
+        start = content.find(ITEM_MARKER.encode())
         if start == -1:
-            raise RuntimeError("Не нашли переменную BACKEND.components.item")
-
-        # Находим первую фигурную скобку после знака '='
-        start = html.find("{", start)
-
-        # Ищем конец объекта: считаем баланс скобок
-        braces = 0
-        end = start
-        for i, ch in enumerate(html[start:], start=start):
-            if ch == "{":
-                braces += 1
-            elif ch == "}":
-                braces -= 1
-                if braces == 0:
-                    end = i + 1
-                    break
-
-        json_text = html[start:end]
+            raise RuntimeError(f"Не нашли переменную {ITEM_MARKER}")
+        end = content.find(b"</script>", start)
+        if end == -1:
+            end = len(content)
+        return hashlib.blake2b(memoryview(content)[start:end], digest_size=16).hexdigest()
 
-        data = json.loads(json_text)
+    @staticmethod
+    def get_product_data_from_html(html: str) -> DataFromHtmlS:
+        # Разбираем только нужные поддеревья BACKEND.components.item
+        data = extract_json_object(html, ITEM_MARKER, keys=ITEM_KEYS)
 
         title = data["card"]["title"]
         min_price = data["card"]["price"]
@@ -95,15 +178,33 @@ class KaspiScraper:
             image_links=image_links
         )
 
+    @timed
+    async def extract_product_data(self, page: ProductPageS) -> DataFromHtmlS:
+        """Декодирует и разбирает страницу в пуле процессов, если он включен, иначе прямо в event loop."""
+        if settings.parser.PARSE_PROCESSES <= 0:
+            return self.get_product_data_from_html(page.content.decode(page.encoding))
+
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=settings.parser.PARSE_PROCESSES)
+
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self.process_pool, extract_product_data, page.content, page.encoding)
+
+        # Данные уже провалидированы в процессе-воркере
+        return DataFromHtmlS.model_construct(**data)
+
+    @timed
     async def get_product_reviews(
         self, product_code: str, product_url: str
     ) -> ReviewsS:
-
-        self.client.headers["Referer"] = product_url
-
         url = f"https://kaspi.kz/yml/review-view/api/v1/reviews/product/{product_code}?baseProductCode&orderCode&filter=COMMENT&sort=POPULARITY&limit=9&merchantCodes&withAgg=true"
 
-        resp = await self.client.get(url)
+        resp = await self.rate_limiter.request(
+            REVIEWS_ENDPOINT, lambda: self.client.get(url, headers={"Referer": product_url})
+        )
+
+        if resp.status_code != 200:
+            raise RuntimeError(f"Error getting product reviews: {resp.status_code}")
 
         data = resp.json()
 
@@ -113,23 +214,18 @@ class KaspiScraper:
 
         return ReviewsS(rating=rating, comments=comments)
 
-    async def get_product_offers(
-        self, product_code: str, product_url: str, brand: str, product_codes: list[str]
-    ) -> list[dict]:
-        self.client.headers["Referer"] = product_url
-
-        self.client.headers["Origin"] = "https://kaspi.kz"
-
+    @timed
+    async def get_product_offers_page(
+        self, product_code: str, product_url: str, brand: str, product_codes: list[str], page: int
+    ) -> dict:
         url = f"https://kaspi.kz/yml/offer-view/offers/{product_code}"
 
-        limit = 60
-
         payload = {
             "cityId": "750000000",
             "id": product_code,
             "merchantUID": [],
-            "limit": limit,
-            "page": 0,
+            "limit": OFFERS_PAGE_LIMIT,
+            "page": page,
             "product": {
                 "brand": brand,
                 "categoryCodes": product_codes,
@@ -144,13 +240,44 @@ class KaspiScraper:
             "installationId": "-1",
         }
 
-        offers = []
+        resp = await self.rate_limiter.request(
+            OFFERS_ENDPOINT,
+            lambda: self.client.post(
+                url=url,
+                json=payload,
+                headers={"Referer": product_url, "Origin": "https://kaspi.kz"},
+            ),
+        )
+
+        if resp.status_code != 200:
+            raise RuntimeError(f"Error getting product offers: {resp.status_code}")
+
+        return resp.json()
+
+    @timed
+    async def get_product_offers(
+        self, product_code: str, product_url: str, brand: str, product_codes: list[str]
+    ) -> list[dict]:
+        # Первая страница нужна, чтобы узнать total
+        first_page = await self.get_product_offers_page(product_code, product_url, brand, product_codes, 0)
+
+        pages_count = math.ceil(first_page["total"] / OFFERS_PAGE_LIMIT)
+
+        # Остальные страницы запрашиваем параллельно с ограничением на продукт
+        semaphore = asyncio.Semaphore(settings.parser.OFFERS_PAGES_CONCURRENCY)
+
+        async def get_page(page: int) -> dict:
+            started = time.perf_counter()
+            async with semaphore:
+                metrics.observe("kaspi_semaphore_wait_seconds", time.perf_counter() - started, semaphore="offers_pages")
+                return await self.get_product_offers_page(product_code, product_url, brand, product_codes, page)
 
-        while True:
-            resp = await self.client.post(url=url, json=payload)
+        # Без одной страницы продукт все равно пропускается, остальные запросы отменяются, чтобы не тратить лимит
+        other_pages = await gather_or_cancel(*(get_page(page) for page in range(1, pages_count)))
 
-            data = resp.json()
+        offers = []
 
+        for data in [first_page, *other_pages]:
             for offer in data["offers"]:
                 offers.append(
                     {
@@ -159,37 +286,91 @@ class KaspiScraper:
                     }
                 )
 
-            if data["total"] <= limit * payload["page"]:
-                break
+        return offers
 
-            payload["page"] += 1
+    @timed
+    async def fetch_product_page(self, url: str, use_cache: bool = False) -> Optional[ProductPageS]:
+        """
+        Скачивает страницу продукта.
+        С use_cache возвращает None, если страница не изменилась с прошлого раза (304 или тот же хеш),
+        тогда разбор, отзывы, офферы и запись в БД можно пропустить.
+        """
+        product_code = self.get_product_code_from_url(url)
 
-        self.client.headers.pop("Origin")
+        cache_entry = None
+        headers = {}
+        if use_cache and self.page_cache is not None:
+            cache_entry = self.page_cache.get(product_code)
+            if cache_entry is not None:
+                if cache_entry.etag:
+                    headers["If-None-Match"] = cache_entry.etag
+                if cache_entry.last_modified:
+                    headers["If-Modified-Since"] = cache_entry.last_modified
 
-        return offers
+        resp = await self.get_product_page(url, headers=headers)
 
-    async def scrape_product_by_url(self, url: str) -> ProductBaseS:
-        html = await self.get_product_page_html(url)
+        if resp.status_code == 304 and cache_entry is not None:
+            logger.info("Product page not modified", extra={"product_code": product_code})
+            return None
 
-        data = self.get_product_data_from_html(html)
+        if resp.status_code != 200:
+            raise RuntimeError(f"Error getting product page: {resp.status_code}")
 
-        product_code = self.get_product_code_from_url(url)
+        content = resp.content
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
 
-        reviews = await self.get_product_reviews(product_code, url)
+        item_hash = None
+        if self.page_cache is not None:
+            item_hash = self.get_item_hash(content)
 
-        offers = await self.get_product_offers(
-            product_code, url, data.brand, data.product_codes
+            if cache_entry is not None and cache_entry.item_hash == item_hash:
+                # stored_at не меняем, чтобы продукт полностью обновлялся раз в MAX_AGE_MINUTES
+                self.page_cache.put(product_code, etag, last_modified, item_hash, stored_at=cache_entry.stored_at)
+                logger.info("Product page unchanged", extra={"product_code": product_code})
+                return None
+
+        return ProductPageS(
+            url=url,
+            product_code=product_code,
+            content=content,
+            encoding=resp.encoding or "utf-8",
+            etag=etag,
+            last_modified=last_modified,
+            item_hash=item_hash,
+        )
+
+    def remember_page(self, page: ProductPageS) -> None:
+        """
+        Запоминает ETag и хеш страницы, когда ее данные уже в БД. Раньше нельзя: если запись не удастся,
+        следующий цикл по тому же хешу посчитает продукт неизменившимся.
+        """
+        if self.page_cache is not None and page.item_hash is not None:
+            self.page_cache.put(page.product_code, page.etag, page.last_modified, page.item_hash)
+
+    @timed
+    async def parse_product_page(self, page: ProductPageS) -> ProductBaseS:
+        """Разбирает страницу и дозапрашивает отзывы и офферы."""
+        url = page.url
+        product_code = page.product_code
+
+        data = await self.extract_product_data(page)
+
+        # Отзывы и офферы зависят только от данных страницы, запрашиваем их одновременно
+        reviews, offers = await gather_or_cancel(
+            self.get_product_reviews(product_code, url),
+            self.get_product_offers(product_code, url, data.brand, data.product_codes),
         )
 
         min_price = offers[0]["price"]
         max_price = offers[-1]["price"]
 
-        price_history = ProductService.format_price_history(min_price=min_price, max_price=max_price)
-        offers_history = ProductService.format_offers_history(offers)
-
         return ProductBaseS(
             product_code=product_code,
             name=data.title,
+            url=url,
+            # Последняя хлебная крошка - категория самого товара. Порядок categoryCodes нигде не задокументирован
+            category=data.category,
             min_price=min_price,
             max_price=max_price,
             rating=reviews.rating,
@@ -198,9 +379,20 @@ class KaspiScraper:
             image_links=data.image_links,
             offers=offers,
             sellers_count=len(offers),
-            price_history=[price_history],
-            offers_history=[offers_history]
+            fingerprints=get_fingerprints(
+                {"details": data.details, "image_links": data.image_links, "offers": offers}
+            ),
         )
 
 
-instagram_scraper = KaspiScraper()
+def extract_product_data(content: bytes, encoding: str) -> dict:
+    """
+    Точка входа для пула процессов: на вход сырые байты страницы, на выход компактный dict,
+    чтобы между процессами передавалось как можно меньше данных.
+    """
+    return KaspiScraper.get_product_data_from_html(content.decode(encoding)).model_dump()
+
+
+@cache
+def get_kaspi_scraper() -> KaspiScraper:
+    return KaspiScraper()
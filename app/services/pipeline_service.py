@@ -0,0 +1,285 @@
+import asyncio
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+import traceback
+from typing import Any, AsyncIterable, Awaitable, Callable, Optional, Union
+from uuid import UUID
+
+from app.schemes.parser import ProductPageS
+from app.schemes.product import ProductBaseS, ProductReadS, ProductSummaryS
+from app.services.export_service import ExportService
+from app.services.parser_service import KaspiScraper
+from app.services.product_exporter import ProductExporter
+from app.services.product_service import ProductService
+from app.services.product_state_cache import ProductState, ProductStateCache
+from app.services.product_writer import ProductWriter
+from app.utils.aiter import iter_chunks
+from app.utils.changes import get_field_changes
+from app.utils.fingerprint import get_state_digest
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Что известно о продукте до парсинга: строка из БД или состояние из кеша
+KnownProduct = Union[ProductSummaryS, ProductState]
+
+
+class ScrapePipeline:
+    """
+    Конвейер обработки ссылок: чтение -> загрузка страницы -> разбор -> запись в БД -> экспорт.
+    Стадии связаны ограниченными очередями, поэтому память не зависит от размера seed,
+    а медленная стадия притормаживает предыдущие. История для экспорта читается пачками (ProductExporter).
+    """
+
+    def __init__(
+        self,
+        scraper: KaspiScraper,
+        product_service_factory: Callable[[], AbstractAsyncContextManager[ProductService]],
+        product_writer: ProductWriter,
+        export_service: ExportService,
+        fetch_workers: int,
+        parse_workers: int,
+        write_workers: int,
+        queue_size: int,
+        freshness: timedelta,
+        chunk_size: int,
+        flush_interval: float = 1.0,
+        reschedule: Optional[Callable[[UUID, Optional[bool]], Awaitable[None]]] = None,
+        state_cache: Optional[ProductStateCache] = None,
+    ) -> None:
+        self.scraper = scraper
+        self.product_service_factory = product_service_factory
+        self.product_writer = product_writer
+        self.export_service = export_service
+
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.write_workers = write_workers
+        self.freshness = freshness
+        self.chunk_size = chunk_size
+        self.reschedule = reschedule
+        self.state_cache = state_cache
+        self.exporter = ProductExporter(product_service_factory, export_service, chunk_size, flush_interval)
+
+        self.fetch_queue: asyncio.Queue[tuple[str]] = asyncio.Queue(maxsize=queue_size)
+        self.parse_queue: asyncio.Queue[tuple[str, Optional[KnownProduct], ProductPageS]] = asyncio.Queue(maxsize=queue_size)
+        self.write_queue: asyncio.Queue[
+            tuple[str, Optional[KnownProduct], Optional[ProductBaseS], Optional[ProductPageS]]
+        ] = asyncio.Queue(maxsize=queue_size)
+
+        self.fresh_count = 0
+        self.scraped_count = 0
+
+        metrics.gauge("kaspi_queue_size", self.fetch_queue.qsize, queue="fetch")
+        metrics.gauge("kaspi_queue_size", self.parse_queue.qsize, queue="parse")
+        metrics.gauge("kaspi_queue_size", self.write_queue.qsize, queue="write")
+
+    async def run_stream(self, urls: AsyncIterable[str], plan: bool = False) -> None:
+        """
+        Обрабатывает поток ссылок. Без plan свежесть не проверяется, источник сам решает, что пора обновлять,
+        с plan ссылки проверяются пачками и свежие продукты отбрасываются до загрузки.
+        """
+        workers = [
+            *self._start_workers(self.fetch_workers, self.fetch_queue, self.fetch),
+            *self._start_workers(self.parse_workers, self.parse_queue, self.parse),
+            *self._start_workers(self.write_workers, self.write_queue, self.write),
+        ]
+
+        try:
+            async with self.exporter:
+                await self.read_stream(urls, plan)
+
+                # Стадии завершаются по порядку: следующая очередь пополняется только предыдущей,
+                # экспорт дожидается остатка при выходе из exporter
+                for queue in (self.fetch_queue, self.parse_queue, self.write_queue):
+                    await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+            # Кеш страниц коммитит пачками, хвост прогона не должен ждать следующей записи
+            if self.scraper.page_cache is not None:
+                self.scraper.page_cache.commit()
+
+        logger.info(
+            "Pipeline finished",
+            extra={"fresh": self.fresh_count, "scraped": self.scraped_count}
+        )
+
+    async def read_stream(self, urls: AsyncIterable[str], plan: bool = False) -> None:
+        if plan:
+            async for chunk in iter_chunks(urls, self.chunk_size):
+                try:
+                    urls_to_scrape = await self.plan(chunk)
+                except Exception as e:
+                    # Ошибка БД пропускает одну пачку, а не останавливает весь прогон
+                    logger.error(
+                        "Error during freshness check",
+                        extra={"urls": len(chunk), "error": str(e), "traceback": traceback.format_exc()}
+                    )
+                    for url in chunk:
+                        self.export_service.write_skipped(url, str(e))
+                    metrics.inc("kaspi_urls_total", len(chunk), result="skipped")
+                    continue
+
+                for url in urls_to_scrape:
+                    await self.fetch_queue.put((url,))
+                    self.scraped_count += 1
+                    metrics.inc("kaspi_urls_total", result="scraped")
+            return
+
+        async for url in urls:
+            await self.fetch_queue.put((url,))
+            self.scraped_count += 1
+            metrics.inc("kaspi_urls_total", result="scraped")
+
+    async def plan(self, urls: list[str]) -> list[str]:
+        """
+        Проверяет свежесть пачки ссылок одним запросом, свежие продукты отдает в экспорт.
+        Возвращает ссылки, которые нужно спарсить.
+        """
+        codes_by_url = {url: self.scraper.get_product_code_from_url(url) for url in urls}
+        codes = set(codes_by_url.values())
+
+        # updated_at известных кешу продуктов берется из него, в БД спрашиваем только остальные
+        updated_at_by_code: dict[str, float] = {}
+        if self.state_cache is not None:
+            for code in codes:
+                state = self.state_cache.get(code)
+                if state is not None:
+                    updated_at_by_code[code] = state.updated_at
+
+        missing_codes = [code for code in codes if code not in updated_at_by_code]
+        if missing_codes:
+            async with self.product_service_factory() as product_service:
+                for code, updated_at in (await product_service.get_updated_at_by_product_codes(missing_codes)).items():
+                    updated_at_by_code[code] = updated_at.timestamp()
+
+        now = time.time()
+        fresh_codes = {
+            code for code, updated_at in updated_at_by_code.items()
+            if now - updated_at < self.freshness.total_seconds()
+        }
+
+        urls_to_scrape = []
+        for url, code in codes_by_url.items():
+            if code in fresh_codes:
+                await self.exporter.export(url, code)
+                self.fresh_count += 1
+                metrics.inc("kaspi_urls_total", result="fresh")
+            else:
+                urls_to_scrape.append(url)
+
+        return urls_to_scrape
+
+    async def fetch(self, url: str) -> None:
+        logger.info("Processing URL...", extra={"url": url})
+
+        product_code = self.scraper.get_product_code_from_url(url)
+
+        # Для сравнения хватает скалярных полей и отпечатков, тяжелые JSONB поля не читаем,
+        # а для продуктов из кеша состояний не читаем ничего
+        product_db: Optional[KnownProduct] = self.state_cache.get(product_code) if self.state_cache else None
+        if product_db is None:
+            async with self.product_service_factory() as product_service:
+                product_db = await product_service.get_by_product_code(product_code, ProductSummaryS)
+
+        # Для уже сохраненных продуктов неизменившаяся страница пропускается
+        page = await self.scraper.fetch_product_page(url, use_cache=product_db is not None)
+        if page is None:
+            await self.write_queue.put((url, product_db, None, None))
+            return
+
+        await self.parse_queue.put((url, product_db, page))
+
+    async def parse(self, url: str, product_db: Optional[KnownProduct], page: ProductPageS) -> None:
+        product_new = await self.scraper.parse_product_page(page)
+        await self.write_queue.put((url, product_db, product_new, page))
+
+    async def write(
+        self,
+        url: str,
+        product_db: Optional[KnownProduct],
+        product_new: Optional[ProductBaseS],
+        page: Optional[ProductPageS],
+    ) -> None:
+        product_code = self.scraper.get_product_code_from_url(url)
+
+        state = product_db if isinstance(product_db, ProductState) else None
+        if state is not None and product_new is not None and state.digest != get_state_digest(product_new):
+            # Продукт изменился, для разницы нужна строка из БД
+            async with self.product_service_factory() as product_service:
+                product_db = await product_service.get_by_product_code(product_code, ProductSummaryS)
+            state = None
+
+        # Обновляем/создаем, changed=None для новых продуктов
+        changed = None
+        product: Optional[ProductReadS] = None
+        price_changed = offers_changed = False
+        if product_new is None or state is not None:
+            changed = False
+            logger.info("Product unchanged", extra={"product_code": product_code})
+        elif product_db:
+            diff = ProductService.get_difference(original=product_db, new=product_new)
+            changed = bool(diff)
+            if diff:
+                price_changed = ProductService.is_price_changed(diff)
+                offers_changed = ProductService.is_offers_changed(diff)
+                product = await self.product_writer.write(
+                    product_new,
+                    price_changed=price_changed,
+                    offers_changed=offers_changed,
+                    changes=get_field_changes(product_db, diff),
+                )
+            logger.info("Product updated", extra={"product_code": product_code})
+        else:
+            product = await self.product_writer.write(product_new)
+            price_changed = offers_changed = True
+            logger.info("Product created", extra={"product_code": product_code})
+
+        # Страница в БД, теперь ее можно пропускать в следующих циклах
+        if page is not None:
+            self.scraper.remember_page(page)
+
+        if self.reschedule is not None:
+            await self.reschedule((product or product_db).id, changed)
+
+        if state is not None and product_new is not None:
+            # Новая версия совпадает с БД, ее и выгружаем без чтения строки
+            updated_at = datetime.fromtimestamp(state.updated_at, timezone.utc)
+            product = ProductReadS.model_construct(
+                **dict(product_new), id=state.id, created_at=updated_at, updated_at=updated_at
+            )
+
+        if self.state_cache is not None:
+            if product is not None:
+                self.state_cache.put(product)
+            elif isinstance(product_db, ProductSummaryS):
+                self.state_cache.put(product_db)
+
+        # Без product полная строка неизменившегося продукта дочитывается в пачке экспорта
+        await self.exporter.export(url, product_code, product, price_changed, offers_changed)
+
+    def _start_workers(
+        self, count: int, queue: asyncio.Queue, handle: Callable[..., Awaitable[None]]
+    ) -> list[asyncio.Task]:
+        return [asyncio.create_task(self._work(queue, handle)) for _ in range(count)]
+
+    async def _work(self, queue: asyncio.Queue, handle: Callable[..., Awaitable[None]]) -> None:
+        while True:
+            item: tuple[Any, ...] = await queue.get()
+            url = item[0]
+            try:
+                await handle(*item)
+            except Exception as e:
+                logger.error(
+                    "Error during product scraping",
+                    extra={"url": url, "error": str(e), "traceback": traceback.format_exc()}
+                )
+                self.export_service.write_skipped(url, str(e))
+                metrics.inc("kaspi_urls_total", result="skipped")
+            finally:
+                queue.task_done()
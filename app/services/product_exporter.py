@@ -0,0 +1,81 @@
+import logging
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Optional
+
+from app.schemes.product import OfferSnapshotS, PriceSnapshotS, ProductReadS
+from app.services.batch_stage import BatchStage
+from app.services.export_service import ExportService
+from app.services.product_service import ProductService
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# URL, product_code, продукт, если он уже на руках, и записаны ли в этом цикле снимки цены и офферов
+ExportItem = tuple[str, str, Optional[ProductReadS], bool, bool]
+
+
+class ProductExporter(BatchStage[ExportItem]):
+    """
+    Стадия экспорта: копит продукты и дочитывает полные строки тех, которых нет на руках (свежие и неизменившиеся),
+    одним запросом на пачку. Пачка ограничена размером batch_size и временем flush_interval, стадии записи ее не ждут.
+
+    В истории экспорта только снимки, записанные в этом цикле: они совпадают с текущим состоянием продукта,
+    поэтому история из БД не читается. Полная история - в price_snapshots/offer_snapshots и price_rollups.
+    """
+
+    def __init__(
+        self,
+        product_service_factory: Callable[[], AbstractAsyncContextManager[ProductService]],
+        export_service: ExportService,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        super().__init__(batch_size, flush_interval, queue="export")
+        self.product_service_factory = product_service_factory
+        self.export_service = export_service
+
+    async def export(
+        self,
+        url: str,
+        product_code: str,
+        product: Optional[ProductReadS] = None,
+        price_changed: bool = False,
+        offers_changed: bool = False,
+    ) -> None:
+        """
+        Ставит продукт в очередь экспорта, без product строка продукта читается из БД.
+        price_changed/offers_changed - в этом цикле записан снимок цены/офферов product.
+        """
+        await self._put((url, product_code, product, price_changed, offers_changed))
+
+    async def _flush(self, batch: list[ExportItem]) -> None:
+        products_by_code = {code: product for _, code, product, *_ in batch if product is not None}
+        missing_codes = list({code for _, code, product, *_ in batch if product is None} - products_by_code.keys())
+
+        # Продукт удален из БД между проверкой и экспортом
+        error = "Product not found"
+        if missing_codes:
+            try:
+                async with self.product_service_factory() as product_service:
+                    for product in await product_service.get_by_product_codes(missing_codes):
+                        products_by_code[product.product_code] = product
+            except Exception as e:
+                logger.error("Error during products batch export", extra={"batch_size": len(missing_codes), "error": str(e)})
+                error = str(e)
+
+        for url, code, _, price_changed, offers_changed in batch:
+            product = products_by_code.get(code)
+            if product is None:
+                self.export_service.write_skipped(url, error)
+                metrics.inc("kaspi_urls_total", result="skipped")
+                continue
+
+            # Снимки записаны вместе с продуктом, время снимка - его updated_at
+            self.export_service.write_product(
+                url,
+                product,
+                [PriceSnapshotS(date=product.updated_at, min_price=product.min_price, max_price=product.max_price)]
+                if price_changed else [],
+                [OfferSnapshotS(date=product.updated_at, offers=product.offers)] if offers_changed else [],
+            )
@@ -1,8 +1,21 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta
 import logging
-from typing import Optional
-from app.repositories.repository import ProductRepository
-from app.schemes.product import ProductBaseS, ProductReadS
+from typing import AsyncIterator, Optional, Union
+from uuid import UUID
+from sqlalchemy import Row
+from app.repositories.repository import ProductRepository, Projection
+from app.schemes.product import (
+    ChangeOffset,
+    OfferSnapshotS,
+    PriceResolution,
+    PriceRollupS,
+    PriceSnapshotS,
+    ProductBaseS,
+    ProductChangeS,
+    ProductReadS,
+    ProductSummaryS,
+    SellerOfferS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,47 +26,102 @@ class ProductService:
         self.product_repository = product_repository
 
     @staticmethod
-    def format_price_history(min_price: float, max_price: float) -> dict:
-        return {
-            "date": datetime.now(timezone.utc).isoformat(),
-            "min_price": min_price,
-            "max_price": max_price,
-        }
+    def is_price_changed(diff: dict) -> bool:
+        return "min_price" in diff or "max_price" in diff
 
     @staticmethod
-    def format_offers_history(offers: list) -> dict:
-        return {
-            "date": datetime.now(timezone.utc).isoformat(),
-            "offers": offers,
-        }
+    def is_offers_changed(diff: dict) -> bool:
+        return "offers" in diff
 
-    async def create(self, schema: ProductBaseS) -> ProductReadS:
-        return await self.product_repository.save(schema)
+    async def get_by_product_code(
+        self, product_code: str, projection: type[Projection] = ProductReadS
+    ) -> Optional[Projection]:
+        return await self.product_repository.get_by_product_code(product_code, projection)
 
-    async def get_by_product_code(self, product_code: str) -> Optional[ProductReadS]:
-        return await self.product_repository.get_by_product_code(product_code)
+    async def get_by_product_codes(
+        self, product_codes: list[str], projection: type[Projection] = ProductReadS
+    ) -> list[Projection]:
+        return await self.product_repository.get_by_product_codes(product_codes, projection)
 
-    async def update_by_difference(
-        self, original: ProductReadS, new: ProductBaseS
-    ) -> ProductReadS:
+    def iter_product_states(self, limit: int) -> AsyncIterator[Row]:
+        return self.product_repository.iter_product_states(limit)
+
+    async def get_updated_at_by_product_codes(self, product_codes: list[str]) -> dict[str, datetime]:
+        return await self.product_repository.get_updated_at_by_product_codes(product_codes)
+
+    async def get_price_history(self, product_ids: list[UUID]) -> dict[UUID, list[PriceSnapshotS]]:
+        return await self.product_repository.get_price_history(product_ids)
+
+    async def get_offers_history(self, product_ids: list[UUID]) -> dict[UUID, list[OfferSnapshotS]]:
+        return await self.product_repository.get_offers_history(product_ids)
+
+    async def get_offers_at(self, product_id: UUID, at: datetime) -> Optional[list[dict]]:
+        return await self.product_repository.get_offers_at(product_id, at)
+
+    async def get_price_series(
+        self, product_ids: list[UUID], start: datetime, end: datetime, resolution: PriceResolution = "day"
+    ) -> dict[UUID, list[PriceRollupS]]:
+        """
+        min/max цены продуктов по часам или дням из rollup таблиц. Интервалов без изменений цены в ответе нет,
+        в них действует close_min_price/close_max_price предыдущего. Первый интервал может начинаться до start:
+        его close - цена на начало ряда.
+        """
+        return await self.product_repository.get_price_rollups(product_ids, resolution, start, end)
+
+    async def get_category_price_series(
+        self, category: str, start: datetime, end: datetime, resolution: PriceResolution = "day"
+    ) -> list[PriceRollupS]:
+        """min/max цены по всем продуктам категории, интервалы как в get_price_series."""
+        return await self.product_repository.get_category_price_rollups(category, resolution, start, end)
+
+    async def get_seller_offers(
+        self, seller: str, max_rank: Optional[int] = None, limit: int = 1000, offset: int = 0
+    ) -> list[SellerOfferS]:
+        return await self.product_repository.get_seller_offers(seller, max_rank, limit, offset)
+
+    async def get_seller_offers_count(self, seller: str) -> dict[int, int]:
+        return await self.product_repository.get_seller_offers_count(seller)
+
+    async def get_changes(self, after: ChangeOffset = (0, 0), limit: int = 1000) -> list[ProductChangeS]:
+        return await self.product_repository.get_changes(after, limit)
+
+    async def delete_changes_before(self, before: datetime) -> int:
+        return await self.product_repository.delete_changes_before(before)
+
+    async def claim_due(self, limit: int, lease: timedelta) -> list[str]:
+        return await self.product_repository.claim_due(limit, lease)
+
+    async def get_next_due_at(self) -> Optional[datetime]:
+        return await self.product_repository.get_next_due_at()
+
+    async def reschedule(self, product_id: UUID, factor: float, min_interval: float, max_interval: float) -> None:
+        await self.product_repository.reschedule(product_id, factor, min_interval, max_interval)
+
+    @staticmethod
+    def get_difference(original: Union[ProductReadS, ProductSummaryS], new: ProductBaseS) -> dict:
+        """
+        Вложенные поля сравниваются по отпечаткам, если они есть у обеих версий,
+        иначе поэлементно. При изменениях в разницу попадают и новые отпечатки.
+        У ProductSummaryS вложенных полей нет, без отпечатков они считаются изменившимися.
+        """
         diff = {}
         for field in new.__class__.model_fields:
+            if field == "fingerprints":
+                continue
+
             new_value = getattr(new, field)
-            old_value = getattr(original, field, None)
-            if new_value != old_value and new_value is not None:
-                diff[field] = new_value
+            if new_value is None:
+                continue
 
-        if original.min_price != new.min_price or original.max_price != new.max_price:
-            price_history = original.price_history
-            price_history.append(self.format_price_history(min_price=new.min_price, max_price=new.max_price))
-            diff["price_history"] = price_history
-        
-        if original.offers != new.offers:
-            offers_history = original.offers_history
-            offers_history.append(self.format_offers_history(offers=new.offers))
-            diff["offers_history"] = offers_history
+            new_fingerprint = new.fingerprints.get(field)
+            old_fingerprint = original.fingerprints.get(field)
+            if new_fingerprint is not None and old_fingerprint is not None:
+                if new_fingerprint != old_fingerprint:
+                    diff[field] = new_value
+            elif new_value != getattr(original, field, None):
+                diff[field] = new_value
 
-        if not diff:
-            return original
+        if diff and new.fingerprints:
+            diff["fingerprints"] = new.fingerprints
 
-        return await self.product_repository.update(original.id, diff)
+        return diff
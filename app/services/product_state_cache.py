@@ -0,0 +1,116 @@
+from array import array
+from datetime import datetime
+import logging
+from typing import Any, AsyncIterable, NamedTuple, Optional
+from uuid import UUID
+
+from app.utils.fingerprint import get_state_digest
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SIZE = 8
+
+
+class ProductState(NamedTuple):
+    id: UUID
+    updated_at: float
+    min_price: float
+    max_price: float
+    sellers_count: int
+    # app.utils.fingerprint.get_state_digest продукта в БД
+    digest: bytes
+
+
+class ProductStateCache:
+    """
+    Долгоживущий кеш состояния продуктов между циклами: по нему пайплайн решает, свежий ли продукт
+    и изменился ли он, не читая строку из Postgres и не собирая pydantic модель.
+
+    Состояния хранятся колонками в array/bytearray, слот продукта ищется по int(product_code),
+    на продукт уходит около 170 байт. При заполнении вытесняется продукт без недавних обращений (алгоритм CLOCK).
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+
+        self.index: dict[int, int] = {}
+        self.codes = array("q")
+        self.ids = bytearray()
+        self.updated_at = array("d")
+        self.min_prices = array("d")
+        self.max_prices = array("d")
+        self.sellers_counts = array("i")
+        self.digests = bytearray()
+        # Флаг обращения для CLOCK, стрелка проходит по слотам и сбрасывает флаги
+        self.referenced = bytearray()
+        self.hand = 0
+
+        metrics.gauge("kaspi_product_state_cache_size", self.__len__)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, product_code: str) -> Optional[ProductState]:
+        slot = self.index.get(int(product_code))
+        if slot is None:
+            metrics.inc("kaspi_product_state_cache_total", result="miss")
+            return None
+
+        metrics.inc("kaspi_product_state_cache_total", result="hit")
+        self.referenced[slot] = 1
+        return ProductState(
+            id=UUID(bytes=bytes(self.ids[slot * 16:(slot + 1) * 16])),
+            updated_at=self.updated_at[slot],
+            min_price=self.min_prices[slot],
+            max_price=self.max_prices[slot],
+            sellers_count=self.sellers_counts[slot],
+            digest=bytes(self.digests[slot * DIGEST_SIZE:(slot + 1) * DIGEST_SIZE]),
+        )
+
+    def put(self, product: Any) -> None:
+        """Сохраняет состояние записанного продукта: схема, ORM объект или строка с полями ProductSummaryS."""
+        code = int(product.product_code)
+        slot = self.index.get(code)
+        if slot is None:
+            slot = self._allocate(code)
+
+        updated_at: datetime = product.updated_at
+        self.ids[slot * 16:(slot + 1) * 16] = product.id.bytes
+        self.updated_at[slot] = updated_at.timestamp()
+        self.min_prices[slot] = product.min_price
+        self.max_prices[slot] = product.max_price
+        self.sellers_counts[slot] = product.sellers_count
+        self.digests[slot * DIGEST_SIZE:(slot + 1) * DIGEST_SIZE] = get_state_digest(product)
+
+    async def warm(self, products: AsyncIterable[Any]) -> None:
+        """Заполняет кеш пачкой продуктов при старте, обычно самыми недавно обновленными."""
+        async for product in products:
+            self.put(product)
+        logger.info("Product state cache warmed", extra={"size": len(self)})
+
+    def _allocate(self, code: int) -> int:
+        if len(self.codes) < self.max_entries:
+            slot = len(self.codes)
+            self.codes.append(code)
+            self.ids.extend(bytes(16))
+            self.updated_at.append(0.0)
+            self.min_prices.append(0.0)
+            self.max_prices.append(0.0)
+            self.sellers_counts.append(0)
+            self.digests.extend(bytes(DIGEST_SIZE))
+            self.referenced.append(0)
+        else:
+            while self.referenced[self.hand]:
+                self.referenced[self.hand] = 0
+                self.hand = (self.hand + 1) % self.max_entries
+            slot = self.hand
+            self.hand = (self.hand + 1) % self.max_entries
+
+            evicted = self.codes[slot]
+            if evicted != -1:
+                del self.index[evicted]
+            self.codes[slot] = code
+
+        self.index[code] = slot
+        return slot
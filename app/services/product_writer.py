@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Optional
+
+from app.repositories.repository import ProductRepository
+from app.schemes.product import ProductBaseS, ProductReadS
+from app.services.batch_stage import BatchStage
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Продукт, нужны ли снимки цены и офферов, изменения для ленты и future для результата записи
+WriteItem = tuple[ProductBaseS, bool, bool, Optional[dict], asyncio.Future]
+
+
+class ProductWriter(BatchStage[WriteItem]):
+    """
+    Write-behind стадия записи продуктов.
+    Копит продукты и сбрасывает их в БД одним upsert на пачку:
+    пачка ограничена размером batch_size и временем flush_interval.
+    """
+
+    def __init__(
+        self,
+        repository_factory: Callable[[], AbstractAsyncContextManager[ProductRepository]],
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        super().__init__(batch_size, flush_interval, queue="db_write")
+        self.repository_factory = repository_factory
+
+    async def write(
+        self,
+        schema: ProductBaseS,
+        price_changed: bool = True,
+        offers_changed: bool = True,
+        changes: Optional[dict] = None,
+    ) -> ProductReadS:
+        """
+        Ставит продукт в очередь и ждет, пока его пачка будет записана.
+        price_changed/offers_changed - дописать ли снимок цены/офферов в историю,
+        changes - изменения полей для ленты изменений (app.utils.changes.get_field_changes).
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._put((schema, price_changed, offers_changed, changes, future))
+        return await future
+
+    async def _flush(self, batch: list[WriteItem]) -> None:
+        # ON CONFLICT не может обновить одну строку дважды, оставляем последнюю версию продукта
+        schemas = {}
+        price_codes = set()
+        offer_codes = set()
+        changes = {}
+        for schema, price_changed, offers_changed, product_changes, _ in batch:
+            schemas[schema.product_code] = schema
+            if price_changed:
+                price_codes.add(schema.product_code)
+            if offers_changed:
+                offer_codes.add(schema.product_code)
+            if product_changes:
+                changes[schema.product_code] = product_changes
+
+        try:
+            async with self.repository_factory() as repository:
+                products = await repository.upsert_many(list(schemas.values()), price_codes, offer_codes, changes)
+        except Exception as e:
+            logger.error("Error during products batch write", extra={"batch_size": len(schemas), "error": str(e)})
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        logger.info("Products batch written", extra={"batch_size": len(schemas)})
+        metrics.inc("kaspi_db_written_products_total", len(schemas))
+
+        products_by_code = {product.product_code: product for product in products}
+        for schema, *_, future in batch:
+            if not future.done():
+                future.set_result(products_by_code[schema.product_code])
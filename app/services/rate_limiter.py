@@ -0,0 +1,200 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import logging
+import random
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Статусы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Статусы, которыми сервер просит снизить частоту запросов
+THROTTLE_STATUSES = {429, 503}
+
+
+class TokenBucket:
+    """
+    Token bucket с адаптивной скоростью (AIMD):
+    на каждый успешный ответ скорость плавно растет, на 429/503 - умножается на decrease_factor.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float,
+        max_rate: float,
+        increase_step: float,
+        decrease_factor: float,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+
+        self._tokens = float(burst)
+        self._updated_at: Optional[float] = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        async with self._lock:
+            while True:
+                now = loop.time()
+
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                if self._updated_at is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttled(self, retry_after: Optional[float]) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._tokens = 0.0
+
+        if retry_after is not None:
+            loop = asyncio.get_running_loop()
+            self._paused_until = max(self._paused_until, loop.time() + retry_after)
+
+
+class RateLimiter:
+    """
+    Ограничивает запросы отдельным token bucket на каждый endpoint
+    и повторяет упавшие запросы с экспоненциальной задержкой и jitter.
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str],
+        rate: float,
+        burst: int,
+        min_rate: float,
+        max_rate: float,
+        increase_step: float,
+        decrease_factor: float,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+    ) -> None:
+        self.buckets = {
+            endpoint: TokenBucket(
+                rate=rate,
+                burst=burst,
+                min_rate=min_rate,
+                max_rate=max_rate,
+                increase_step=increase_step,
+                decrease_factor=decrease_factor,
+            )
+            for endpoint in endpoints
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.counters: dict[str, Counter] = {endpoint: Counter() for endpoint in endpoints}
+
+    @staticmethod
+    def get_retry_after(resp: httpx.Response) -> Optional[float]:
+        """Retry-After бывает числом секунд или HTTP датой."""
+        value = resp.headers.get("Retry-After")
+        if value is None:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+    def get_backoff(self, attempt: int) -> float:
+        # Full jitter: случайная задержка от 0 до base * 2^attempt
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(
+        self, endpoint: str, send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        bucket = self.buckets[endpoint]
+        counters = self.counters[endpoint]
+
+        attempt = 0
+
+        while True:
+            with metrics.timer("kaspi_rate_limit_wait_seconds", endpoint=endpoint):
+                await bucket.acquire()
+            counters["requests"] += 1
+
+            try:
+                resp = await send()
+            except httpx.TransportError as e:
+                counters["transport_errors"] += 1
+                metrics.inc("kaspi_http_transport_errors_total", endpoint=endpoint)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.get_backoff(attempt)
+                logger.warning(
+                    "Request failed, retrying",
+                    extra={"endpoint": endpoint, "error": str(e), "attempt": attempt + 1, "delay": delay},
+                )
+                counters["retries"] += 1
+                metrics.inc("kaspi_http_retries_total", endpoint=endpoint)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            counters[f"status_{resp.status_code}"] += 1
+            metrics.inc("kaspi_http_responses_total", endpoint=endpoint, status=resp.status_code)
+
+            retry_after = None
+            if resp.status_code in THROTTLE_STATUSES:
+                counters["throttled"] += 1
+                retry_after = self.get_retry_after(resp)
+                bucket.on_throttled(retry_after)
+            elif resp.status_code < 400:
+                bucket.on_success()
+
+            if resp.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return resp
+
+            delay = max(self.get_backoff(attempt), retry_after or 0.0)
+            logger.warning(
+                "Request failed, retrying",
+                extra={"endpoint": endpoint, "status_code": resp.status_code, "attempt": attempt + 1, "delay": delay},
+            )
+            counters["retries"] += 1
+            metrics.inc("kaspi_http_retries_total", endpoint=endpoint)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def get_stats(self) -> dict:
+        return {
+            endpoint: {"rate": round(self.buckets[endpoint].rate, 3), **counters}
+            for endpoint, counters in self.counters.items()
+        }
@@ -0,0 +1,124 @@
+import asyncio
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import AsyncIterable, AsyncIterator, Callable, Optional
+from uuid import UUID
+
+from app.services.parser_service import KaspiScraper
+from app.services.product_service import ProductService
+from app.services.product_state_cache import ProductStateCache
+from app.utils.aiter import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+
+class ProductScheduler:
+    """
+    Обновляет каждый продукт, когда подходит его next_due_at, вместо полного прохода по seed.
+    Интервал продукта сокращается, если при обновлении нашлись изменения, и растет, если нет.
+    Новые ссылки из seed и листингов подхватываются раз в seed_reload.
+    """
+
+    def __init__(
+        self,
+        scraper: KaspiScraper,
+        product_service_factory: Callable[[], AbstractAsyncContextManager[ProductService]],
+        seed_loader: Callable[[], AsyncIterable[str]],
+        batch_size: int,
+        lease: timedelta,
+        min_interval: float,
+        max_interval: float,
+        increase_factor: float,
+        decrease_factor: float,
+        poll_interval: timedelta,
+        seed_reload: timedelta,
+        state_cache: Optional[ProductStateCache] = None,
+    ) -> None:
+        self.scraper = scraper
+        self.product_service_factory = product_service_factory
+        self.seed_loader = seed_loader
+        self.batch_size = batch_size
+        self.lease = lease
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.increase_factor = increase_factor
+        self.decrease_factor = decrease_factor
+        self.poll_interval = poll_interval
+        self.seed_reload = seed_reload
+        self.state_cache = state_cache
+
+    async def urls(self) -> AsyncIterator[str]:
+        """Бесконечный поток ссылок продуктов, которым пора обновиться."""
+        next_seed_at = datetime.now(timezone.utc)
+
+        while True:
+            if datetime.now(timezone.utc) >= next_seed_at:
+                async for url in self.new_seed_urls():
+                    yield url
+                next_seed_at = datetime.now(timezone.utc) + self.seed_reload
+
+            try:
+                async with self.product_service_factory() as product_service:
+                    urls = await product_service.claim_due(self.batch_size, self.lease)
+            except Exception as e:
+                # Временная ошибка БД не должна останавливать планировщик, пробуем после паузы
+                logger.error("Error claiming due products", extra={"error": str(e)})
+                await asyncio.sleep(self.poll_interval.total_seconds())
+                continue
+
+            for url in urls:
+                yield url
+
+            if len(urls) < self.batch_size:
+                await self.wait(next_seed_at)
+
+    async def new_seed_urls(self) -> AsyncIterator[str]:
+        """Ссылки из seed и листингов, которых еще нет в БД. Остальными управляет расписание."""
+        async for chunk in iter_chunks(self.seed_loader(), self.batch_size):
+            codes_by_url = {url: self.scraper.get_product_code_from_url(url) for url in chunk}
+
+            # Продукты из кеша состояний точно есть в БД, спрашиваем только про остальные
+            codes = set(codes_by_url.values())
+            if self.state_cache is not None:
+                codes = {code for code in codes if self.state_cache.get(code) is None}
+            if not codes:
+                continue
+
+            try:
+                async with self.product_service_factory() as product_service:
+                    known_codes = await product_service.get_updated_at_by_product_codes(list(codes))
+            except Exception as e:
+                # Пачка подхватится при следующей загрузке seed
+                logger.error("Error checking seed products", extra={"urls": len(chunk), "error": str(e)})
+                continue
+
+            for url, code in codes_by_url.items():
+                if code in codes and code not in known_codes:
+                    yield url
+
+    async def wait(self, next_seed_at: datetime) -> None:
+        """Спит до ближайшего next_due_at, но не дольше poll_interval и следующей загрузки seed."""
+        try:
+            async with self.product_service_factory() as product_service:
+                next_due_at = await product_service.get_next_due_at()
+        except Exception as e:
+            logger.error("Error getting next due product", extra={"error": str(e)})
+            next_due_at = None
+
+        now = datetime.now(timezone.utc)
+        wake_at = min(now + self.poll_interval, next_seed_at)
+        if next_due_at is not None:
+            wake_at = min(wake_at, next_due_at)
+
+        # Не чаще раза в секунду, даже если due продукты сейчас заблокированы другими воркерами
+        await asyncio.sleep(max(1.0, (wake_at - now).total_seconds()))
+
+    async def reschedule(self, product_id: UUID, changed: Optional[bool]) -> None:
+        """changed=None - продукт только что создан, интервал не меняется."""
+        factor = 1.0
+        if changed is not None:
+            factor = self.decrease_factor if changed else self.increase_factor
+
+        async with self.product_service_factory() as product_service:
+            await product_service.reschedule(product_id, factor, self.min_interval, self.max_interval)
@@ -0,0 +1,93 @@
+import json
+import logging
+from pathlib import Path
+from typing import Iterator, Literal, Union
+
+from app.utils.bloom_filter import BloomFilter
+from app.utils.json_extractor import iter_json_array
+from app.utils.product_url import ProductUrl, parse_product_url
+
+logger = logging.getLogger(__name__)
+
+SEED_JSON_KEY = '"products_urls"'
+
+Seen = Union[set[int], BloomFilter]
+
+
+class SeedLoader:
+    """
+    Потоковое чтение seed: JSON ({"products_urls": [...]}), JSONL (строка или {"url": ...} в строке)
+    и текст (ссылка в строке, # - комментарий). Формат определяется по расширению файла.
+    Ссылки приводятся к каноническому виду, повторы product_code отбрасываются.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dedup: Literal["set", "bloom"] = "set",
+        bloom_capacity: int = 10_000_000,
+        bloom_error_rate: float = 1e-6,
+    ) -> None:
+        self.path = path
+        self.dedup = dedup
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+
+    def __iter__(self) -> Iterator[ProductUrl]:
+        return self.iter_products(self.create_seen())
+
+    def create_seen(self) -> Seen:
+        if self.dedup == "bloom":
+            return BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        return set()
+
+    @staticmethod
+    def add_seen(seen: Seen, product_code: str) -> bool:
+        """Запоминает product_code, True - если его еще не было."""
+        if isinstance(seen, BloomFilter):
+            return seen.add(product_code)
+
+        # int вместо строки в несколько раз компактнее в set
+        code = int(product_code)
+        if code in seen:
+            return False
+        seen.add(code)
+        return True
+
+    def iter_products(self, seen: Seen) -> Iterator[ProductUrl]:
+        """Ссылки из seed, которых нет в seen. seen можно дальше использовать для других источников ссылок."""
+        read = invalid = duplicates = 0
+        for url in self.iter_raw_urls():
+            read += 1
+
+            product_url = parse_product_url(url)
+            if product_url is None:
+                invalid += 1
+                logger.warning("Invalid seed URL", extra={"url": url})
+                continue
+
+            if not self.add_seen(seen, product_url.product_code):
+                duplicates += 1
+                continue
+
+            yield product_url
+
+        logger.info(
+            "Seed loaded",
+            extra={"path": str(self.path), "read": read, "invalid": invalid, "duplicates": duplicates},
+        )
+
+    def iter_raw_urls(self) -> Iterator[str]:
+        with self.path.open("r", encoding="utf-8") as f:
+            if self.path.suffix == ".json":
+                yield from iter_json_array(f, SEED_JSON_KEY)
+            elif self.path.suffix == ".jsonl":
+                for line in f:
+                    if line.strip():
+                        value = json.loads(line)
+                        yield value if isinstance(value, str) else value["url"]
+            else:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line
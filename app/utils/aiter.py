@@ -0,0 +1,16 @@
+from typing import AsyncIterable, AsyncIterator, TypeVar
+
+T = TypeVar("T")
+
+
+async def iter_chunks(items: AsyncIterable[T], size: int) -> AsyncIterator[list[T]]:
+    """Пачки по size элементов из асинхронного источника, последняя пачка может быть меньше."""
+    chunk: list[T] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
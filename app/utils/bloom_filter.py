@@ -0,0 +1,34 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Вероятностное множество фиксированного размера: m бит на capacity элементов с долей ложных срабатываний error_rate.
+    Ложное срабатывание означает, что новый элемент посчитается уже виденным.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _get_positions(self, key: str) -> list[int]:
+        # Double hashing: k позиций из двух 64-битных хешей
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key: str) -> bool:
+        """Добавляет ключ, возвращает True, если его (вероятно) еще не было."""
+        added = False
+        for position in self._get_positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._get_positions(key))
@@ -0,0 +1,48 @@
+from typing import Any, Optional
+
+from app.utils.offers_delta import Offer, get_seller_ranks
+
+# Поля, изменения которых попадают в ленту со старым и новым значением
+TRACKED_FIELDS = ("name", "url", "category", "min_price", "max_price", "rating", "comments_count", "sellers_count")
+
+# Вложенные поля, по которым в ленту попадает только факт изменения
+FLAGGED_FIELDS = ("details", "image_links")
+
+
+def get_field_changes(original: Optional[Any], diff: dict) -> dict:
+    """{поле: {"old", "new"}} по разнице продукта, original=None для нового продукта."""
+    changes: dict[str, Any] = {
+        field: {"old": getattr(original, field, None), "new": diff[field]}
+        for field in TRACKED_FIELDS if field in diff
+    }
+    changes.update({field: {"changed": True} for field in FLAGGED_FIELDS if field in diff})
+    return changes
+
+
+def get_offers_changes(old: list[Offer], new: list[Offer]) -> Optional[dict]:
+    """
+    Изменения офферов по продавцам: added/removed - пришедшие и ушедшие продавцы с ценой,
+    changed - продавцы с новой ценой. None, если цены продавцов не изменились.
+    """
+    old_prices = {name: price for name, (price, _) in get_seller_ranks(old).items()}
+    new_prices = {name: price for name, (price, _) in get_seller_ranks(new).items()}
+
+    changes = {}
+
+    added = [{"name": name, "price": price} for name, price in new_prices.items() if name not in old_prices]
+    if added:
+        changes["added"] = added
+
+    removed = [{"name": name, "price": price} for name, price in old_prices.items() if name not in new_prices]
+    if removed:
+        changes["removed"] = removed
+
+    changed = [
+        {"name": name, "old_price": old_prices[name], "price": price}
+        for name, price in new_prices.items()
+        if name in old_prices and old_prices[name] != price
+    ]
+    if changed:
+        changes["changed"] = changed
+
+    return changes or None
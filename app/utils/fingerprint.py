@@ -0,0 +1,33 @@
+import hashlib
+import json
+from typing import Any
+
+# Вложенные поля продукта, которые сравниваются по отпечатку, а не поэлементно
+FINGERPRINT_FIELDS = ("image_links", "details", "offers")
+
+
+def get_fingerprint(value: Any) -> str:
+    """Отпечаток содержимого: одинаковые данные дают одинаковый хеш независимо от порядка ключей."""
+    data = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+
+def get_fingerprints(values: dict[str, Any]) -> dict[str, str]:
+    return {field: get_fingerprint(values[field]) for field in FINGERPRINT_FIELDS if field in values}
+
+
+# Скалярные поля, которые вместе с отпечатками входят в отпечаток состояния продукта
+STATE_FIELDS = ("name", "url", "category", "min_price", "max_price", "rating", "comments_count", "sellers_count")
+
+
+def get_state_digest(product: Any) -> bytes:
+    """
+    Короткий отпечаток всего, что сравнивает ProductService.get_difference: у продукта в БД
+    и нового продукта он совпадает, только если разницы нет. Принимает схему, ORM объект или строку запроса.
+    """
+    values = tuple(
+        float(value) if isinstance(value, int) and not isinstance(value, bool) else value
+        for value in (getattr(product, field) for field in STATE_FIELDS)
+    )
+    data = repr((values, sorted(product.fingerprints.items())))
+    return hashlib.blake2b(data.encode(), digest_size=8).digest()
@@ -0,0 +1,140 @@
+import json
+import re
+from json.decoder import WHITESPACE, scanstring
+from typing import Any, Iterable, Iterator, Optional, TextIO
+
+_decoder = json.JSONDecoder()
+
+# Символы, которыми может продолжаться JSON число: число у конца куска может быть обрезано (1.|5, 1.5e|10)
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+
+
+def find_json_object(text: str, marker: str) -> int:
+    """Возвращает позицию первой '{' после marker."""
+    start = text.find(marker)
+    if start == -1:
+        raise RuntimeError(f"Не нашли переменную {marker}")
+
+    start = text.find("{", start + len(marker))
+    if start == -1:
+        raise RuntimeError(f"Не нашли JSON объект после {marker}")
+
+    return start
+
+
+def extract_json_object(text: str, marker: str, keys: Optional[Iterable[str]] = None) -> dict:
+    """
+    Разбирает JSON объект, который идет после marker, прямо из text без копирования хвоста страницы.
+    Скобки внутри строк обрабатываются декодером json.
+
+    Если переданы keys, разбирает только эти ключи верхнего уровня и останавливается,
+    как только все они найдены.
+    """
+    start = find_json_object(text, marker)
+
+    if keys is None:
+        data, _ = _decoder.raw_decode(text, start)
+        return data
+
+    return _extract_keys(text, start, set(keys))
+
+
+def _extract_keys(text: str, start: int, keys: set[str]) -> dict:
+    data = {}
+    idx = WHITESPACE.match(text, start + 1).end()
+
+    if text[idx:idx + 1] == "}":
+        return data
+
+    while keys:
+        if text[idx:idx + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, idx)
+        key, idx = scanstring(text, idx + 1)
+
+        idx = WHITESPACE.match(text, idx).end()
+        if text[idx:idx + 1] != ":":
+            raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+        value, idx = _decoder.raw_decode(text, idx)
+        if key in keys:
+            data[key] = value
+            keys.discard(key)
+
+        idx = WHITESPACE.match(text, idx).end()
+        delimiter = text[idx:idx + 1]
+        if delimiter == "}":
+            break
+        if delimiter != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+        idx = WHITESPACE.match(text, idx + 1).end()
+
+    return data
+
+
+def iter_json_array(file: TextIO, marker: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Потоково отдает элементы JSON массива, который идет после marker, читая файл кусками по chunk_size.
+    В памяти держится только текущий кусок, а не весь файл.
+    """
+    buffer = ""
+    eof = False
+
+    def read() -> bool:
+        nonlocal buffer, eof
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer += chunk
+        return True
+
+    # Маркер и '[' могут попасть на границу кусков
+    while (start := buffer.find(marker)) == -1:
+        buffer = buffer[-len(marker):]
+        if not read():
+            raise RuntimeError(f"Не нашли переменную {marker}")
+    buffer = buffer[start + len(marker):]
+
+    while (start := buffer.find("[")) == -1:
+        if not read():
+            raise RuntimeError(f"Не нашли JSON массив после {marker}")
+    buffer = buffer[start + 1:]
+
+    idx = 0
+    while True:
+        idx = WHITESPACE.match(buffer, idx).end()
+        if idx == len(buffer):
+            buffer, idx = "", 0
+            if not read():
+                raise json.JSONDecodeError("Unexpected end of array", buffer, idx)
+            continue
+
+        delimiter = buffer[idx]
+        if delimiter == "]":
+            return
+        if delimiter == ",":
+            idx += 1
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buffer, idx)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+
+        # Элемент обрезан концом куска: дочитываем и разбираем заново. Обрезанное число декодер
+        # разбирает как более короткое, поэтому число, которое доходит до конца куска, тоже неполное
+        if end is None or not eof and (
+            end == len(buffer) or _NUMBER_CHARS.match(buffer, idx).end() == len(buffer)
+        ):
+            buffer, idx = buffer[idx:], 0
+            read()
+            continue
+
+        yield value
+        idx = end
+
+        if idx > chunk_size:
+            buffer, idx = buffer[idx:], 0
@@ -0,0 +1,210 @@
+import asyncio
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import random
+import statistics
+import time
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+Labels = tuple[tuple[str, str], ...]
+
+# Границы гистограмм в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Сколько значений за цикл хранить для p50/p99, дальше выборка случайная (reservoir sampling)
+RESERVOIR_SIZE = 10_000
+
+
+def get_labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Histogram:
+    """Накопительная гистограмма для /metrics и выборка значений текущего цикла для сводки в лог."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+        self.window: list[float] = []
+        self.window_count = 0
+        self.window_sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+        self.window_count += 1
+        self.window_sum += value
+        if len(self.window) < RESERVOIR_SIZE:
+            self.window.append(value)
+        else:
+            index = random.randrange(self.window_count)
+            if index < RESERVOIR_SIZE:
+                self.window[index] = value
+
+    def get_window_summary(self) -> dict:
+        window = sorted(self.window)
+        summary = {
+            "count": self.window_count,
+            "total": round(self.window_sum, 3),
+            "p50": round(statistics.median(window), 4) if window else 0.0,
+            "p99": round(window[min(len(window) - 1, int(len(window) * 0.99))], 4) if window else 0.0,
+        }
+
+        self.window = []
+        self.window_count = 0
+        self.window_sum = 0.0
+        return summary
+
+
+class Metrics:
+    """
+    Счетчики, гистограммы и gauge в памяти процесса без внешних зависимостей.
+    Отдаются в текстовом формате Prometheus и сводкой за цикл в лог.
+    """
+
+    def __init__(self) -> None:
+        self.counters: dict[str, dict[Labels, float]] = defaultdict(dict)
+        self.histograms: dict[str, dict[Labels, Histogram]] = defaultdict(dict)
+        self.gauges: dict[str, dict[Labels, Callable[[], float]]] = defaultdict(dict)
+
+        # Значения счетчиков на начало цикла, чтобы в сводке были приросты
+        self._cycle_counters: dict[tuple[str, Labels], float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        series = self.counters[name]
+        key = get_labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        series = self.histograms[name]
+        key = get_labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def gauge(self, name: str, func: Callable[[], float], **labels) -> None:
+        """Значение gauge читается вызовом func в момент запроса /metrics или сводки."""
+        self.gauges[name][get_labels(labels)] = func
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self) -> str:
+        lines = []
+
+        for name, series in self.counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{format_labels(labels)} {value}" for labels, value in series.items())
+
+        for name, series in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{format_labels(labels)} {func()}" for labels, func in series.items())
+
+        for name, series in self.histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bucket, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bucket)),))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def get_cycle_summary(self) -> dict:
+        """Приросты счетчиков, p50/p99 гистограмм и текущие gauge с прошлой сводки."""
+        counters = {}
+        for name, series in self.counters.items():
+            for labels, value in series.items():
+                delta = value - self._cycle_counters.get((name, labels), 0)
+                self._cycle_counters[(name, labels)] = value
+                if delta:
+                    counters[f"{name}{format_labels(labels)}"] = delta
+
+        histograms = {
+            f"{name}{format_labels(labels)}": histogram.get_window_summary()
+            for name, series in self.histograms.items()
+            for labels, histogram in series.items()
+            if histogram.window_count
+        }
+
+        gauges = {
+            f"{name}{format_labels(labels)}": func()
+            for name, series in self.gauges.items()
+            for labels, func in series.items()
+        }
+
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+
+metrics = Metrics()
+
+
+def timed(func: Callable) -> Callable:
+    """Span вокруг async метода: время попадает в kaspi_span_seconds{span="Класс.метод"}."""
+    span = func.__qualname__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with metrics.timer("kaspi_span_seconds", span=span):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.Server:
+    """Минимальный HTTP сервер: на GET /metrics отдает метрики в формате Prometheus, на остальные пути - 404."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Заголовки запроса не нужны, дочитываем до пустой строки
+            while (await reader.readline()).strip():
+                pass
+
+            if request_line.split(b" ")[1:2] == [b"/metrics"]:
+                status, body = "200 OK", metrics.render().encode()
+            else:
+                status, body = "404 Not Found", b""
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("Metrics server started", extra={"host": host, "port": port})
+    return server
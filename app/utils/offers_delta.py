@@ -0,0 +1,68 @@
+from typing import Any, Optional
+
+Offer = dict[str, Any]
+
+
+def get_offers_delta(old: list[Offer], new: list[Offer]) -> Optional[dict]:
+    """
+    Разница между двумя списками офферов по продавцам:
+    added - новые продавцы, removed - имена ушедших, changed - продавцы с новой ценой.
+    Если имена продавцов не уникальны, разницу не построить и возвращается None.
+    """
+    old_by_name = {offer["name"]: offer for offer in old}
+    new_by_name = {offer["name"]: offer for offer in new}
+    if len(old_by_name) != len(old) or len(new_by_name) != len(new):
+        return None
+
+    delta = {}
+
+    added = [offer for name, offer in new_by_name.items() if name not in old_by_name]
+    if added:
+        delta["added"] = added
+
+    removed = [name for name in old_by_name if name not in new_by_name]
+    if removed:
+        delta["removed"] = removed
+
+    changed = [
+        offer for name, offer in new_by_name.items()
+        if name in old_by_name and old_by_name[name] != offer
+    ]
+    if changed:
+        delta["changed"] = changed
+
+    return delta
+
+
+def apply_offers_delta(offers: list[Offer], delta: dict) -> list[Offer]:
+    """Применяет разницу к списку офферов, результат отсортирован по цене, как отдает Kaspi."""
+    by_name = {offer["name"]: offer for offer in offers}
+
+    for name in delta.get("removed", ()):
+        by_name.pop(name, None)
+    for offer in (*delta.get("changed", ()), *delta.get("added", ())):
+        by_name[offer["name"]] = offer
+
+    return sorted(by_name.values(), key=lambda offer: offer["price"])
+
+
+def get_seller_ranks(offers: list[Offer]) -> dict[str, tuple[float, int]]:
+    """
+    Продавец -> (цена, место по цене). У продавца с несколькими офферами берется самый дешевый,
+    продавцы с одинаковой ценой делят место.
+    """
+    cheapest: dict[str, float] = {}
+    for offer in offers:
+        price = offer["price"]
+        if offer["name"] not in cheapest or price < cheapest[offer["name"]]:
+            cheapest[offer["name"]] = price
+
+    ranks = {}
+    rank = 0
+    previous_price = None
+    for position, (name, price) in enumerate(sorted(cheapest.items(), key=lambda item: item[1]), start=1):
+        if price != previous_price:
+            rank = position
+            previous_price = price
+        ranks[name] = (price, rank)
+    return ranks
@@ -0,0 +1,14 @@
+from datetime import datetime, timedelta, timezone
+
+from app.schemes.product import PriceResolution
+
+RESOLUTIONS: dict[str, timedelta] = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def truncate(value: datetime, resolution: PriceResolution) -> datetime:
+    """Начало интервала в UTC, как date_trunc(resolution, value, 'UTC')."""
+    value = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if resolution == "day":
+        value = value.replace(hour=0)
+    return value
+
@@ -0,0 +1,34 @@
+import re
+from typing import NamedTuple, Optional
+
+# Разбор регулярками, а не urllib.parse: seed может содержать миллионы ссылок
+PRODUCT_URL = re.compile(
+    r"^https?://(?:[\w-]+\.)*kaspi\.kz/shop/p/(?:(?P<slug>[^/?#]*)-)?(?P<code>\d+)/?(?:\?(?P<query>[^#]*))?(?:#.*)?$"
+)
+# Из query string значим только город, от него зависят цены, остальное - метки рекламы
+CITY_PARAM = re.compile(r"(?:^|&)c=([^&]*)")
+
+
+class ProductUrl(NamedTuple):
+    product_code: str
+    url: str
+
+
+def parse_product_url(url: str) -> Optional[ProductUrl]:
+    """
+    Канонический вид ссылки на товар: https://kaspi.kz/shop/p/<slug>-<code>/?c=<город>.
+    Для ссылок не на страницу товара возвращает None.
+    """
+    match = PRODUCT_URL.match(url.strip())
+    if match is None:
+        return None
+
+    code = match["code"]
+    slug = match["slug"]
+    canonical = f"https://kaspi.kz/shop/p/{slug}-{code}/" if slug else f"https://kaspi.kz/shop/p/{code}/"
+
+    query = match["query"]
+    if query and (city := CITY_PARAM.search(query)):
+        canonical += f"?c={city[1]}"
+
+    return ProductUrl(code, canonical)
@@ -0,0 +1,10 @@
+import zlib
+
+
+def get_shard(key: str, shard_count: int) -> int:
+    """Стабильный между процессами и запусками номер шарда, в отличие от встроенного hash()."""
+    return zlib.crc32(key.encode()) % shard_count
+
+
+def is_own_shard(key: str, shard_index: int, shard_count: int) -> bool:
+    return shard_count <= 1 or get_shard(key, shard_count) == shard_index
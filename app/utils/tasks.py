@@ -0,0 +1,17 @@
+import asyncio
+from typing import Any, Awaitable
+
+
+async def gather_or_cancel(*aws: Awaitable[Any]) -> list[Any]:
+    """
+    Как asyncio.gather, но при первой ошибке отменяет остальные задачи, дожидается их отмены и пробрасывает ошибку.
+    asyncio.TaskGroup делает то же самое, но появился только в Python 3.11.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
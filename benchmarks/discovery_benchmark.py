@@ -0,0 +1,108 @@
+"""
+Обход листингов ListingCrawler на локальной замене kaspi.kz (benchmarks.mock_kaspi).
+
+Запуск:
+    python -m benchmarks.discovery_benchmark [--categories Smartphones Notebooks] [--listing-products 5000]
+                                             [--new-products 30] [--listings-dir listings/]
+
+Первый проход идет с пустым состоянием и обходит листинги целиком, перед каждым следующим
+в синтетических листингах появляется --new-products товаров. Повторный проход должен запрашивать
+только первые страницы с новыми товарами. Печатает число запрошенных страниц и новых товаров за проход.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+import tempfile
+import threading
+import time
+
+# До импорта app: replay_benchmark подставляет настройки для бенчмарка
+from benchmarks.replay_benchmark import RedirectTransport, get_free_port
+
+import httpx  # noqa: E402
+
+from app.services.discovery_service import Listing, ListingCrawler  # noqa: E402
+from app.services.listing_state import ListingState  # noqa: E402
+from app.services.parser_service import get_kaspi_scraper  # noqa: E402
+from benchmarks.mock_kaspi import MockKaspiServer  # noqa: E402
+
+
+async def run(args: argparse.Namespace, server: MockKaspiServer, port: int) -> list[dict]:
+    scraper = get_kaspi_scraper()
+    scraper.client = httpx.AsyncClient(
+        headers=scraper.client.headers,
+        timeout=scraper.client.timeout,
+        transport=RedirectTransport("127.0.0.1", port),
+    )
+
+    listings = [
+        *(Listing("category", category) for category in args.categories),
+        *(Listing("search", query) for query in args.queries),
+    ]
+    state_path = Path(tempfile.mkdtemp(prefix="kaspi-discovery-")) / "listings.sqlite3"
+
+    results = []
+    for cycle in range(args.cycles):
+        if cycle:
+            server.listing_products += args.new_products
+
+        crawler = ListingCrawler(
+            scraper=scraper,
+            city_id="750000000",
+            concurrency=args.concurrency,
+            max_pages=args.max_pages,
+            full_rescan_seconds=args.full_rescan_hours * 3600,
+            state=ListingState(state_path),
+        )
+
+        requests = server.listing_requests
+        started = time.perf_counter()
+        products = [product_url async for product_url in crawler.discover(listings)]
+        seconds = time.perf_counter() - started
+
+        results.append(
+            {
+                "cycle": cycle + 1,
+                "listing_products": server.listing_products,
+                "pages": server.listing_requests - requests,
+                "products": len(products),
+                "seconds": round(seconds, 3),
+            }
+        )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", nargs="*", default=["Smartphones", "Notebooks"])
+    parser.add_argument("--queries", nargs="*", default=[])
+    parser.add_argument("--listing-products", type=int, default=5000, help="товаров в синтетическом листинге")
+    parser.add_argument("--new-products", type=int, default=30, help="новых товаров перед каждым повторным проходом")
+    parser.add_argument("--listings-dir", type=Path, default=None, help="папка с сохраненными листингами *.json")
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-pages", type=int, default=1000)
+    parser.add_argument("--full-rescan-hours", type=float, default=24)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка каждого ответа")
+    args = parser.parse_args()
+
+    # Сервер в потоке этого процесса, чтобы между проходами добавлять товары в листинги
+    port = get_free_port()
+    server = MockKaspiServer(
+        ("127.0.0.1", port),
+        latency=args.latency_ms / 1000,
+        listings_dir=args.listings_dir,
+        listing_products=args.listing_products,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for result in asyncio.run(run(args, server, port)):
+            print(json.dumps(result, ensure_ascii=False))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
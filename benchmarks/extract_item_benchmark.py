@@ -0,0 +1,69 @@
+"""
+Микро-бенчмарк извлечения BACKEND.components.item из страницы товара.
+
+Запуск:
+    python -m benchmarks.extract_item_benchmark [сохраненные_страницы.html ...]
+
+Без аргументов используется синтетическая страница из benchmarks.fixtures.
+"""
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from app.services.parser_service import ITEM_KEYS
+from app.utils.json_extractor import extract_json_object
+from benchmarks.fixtures import make_product_page
+
+MARKER = "BACKEND.components.item"
+
+
+def legacy_extract(html: str) -> dict:
+    """Прежняя реализация: посимвольный подсчет скобок по копии хвоста страницы."""
+    start = html.find(MARKER)
+    start = html.find("{", start)
+
+    braces = 0
+    end = start
+    for i, ch in enumerate(html[start:], start=start):
+        if ch == "{":
+            braces += 1
+        elif ch == "}":
+            braces -= 1
+            if braces == 0:
+                end = i + 1
+                break
+
+    return json.loads(html[start:end])
+
+
+def bench(name: str, func, html: str, number: int) -> float:
+    seconds = min(timeit.repeat(lambda: func(html), number=number, repeat=5)) / number
+    print(f"  {name:<22} {seconds * 1000:8.3f} ms")
+    return seconds
+
+
+def main(paths: list[str]) -> None:
+    pages = {path: Path(path).read_text(encoding="utf-8") for path in paths}
+    if not pages:
+        pages = {"synthetic": make_product_page("117046774")}
+
+    for name, html in pages.items():
+        print(f"{name}: {len(html) / 1024:.0f} KB")
+
+        try:
+            legacy = bench("legacy brace counting", legacy_extract, html, 20)
+        except json.JSONDecodeError as e:
+            # Скобки внутри строк ломают подсчет баланса
+            legacy = None
+            print(f"  {'legacy brace counting':<22} failed: {e.msg}")
+
+        full = bench("raw_decode", lambda page: extract_json_object(page, MARKER), html, 20)
+        subtrees = bench("raw_decode subtrees", lambda page: extract_json_object(page, MARKER, ITEM_KEYS), html, 20)
+
+        if legacy is not None:
+            print(f"  speedup: x{legacy / full:.1f} (full), x{legacy / subtrees:.1f} (subtrees)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+"""Синтетические страницы и ответы Kaspi для бенчмарков, повторяют структуру настоящих."""
+import json
+import random
+
+
+def make_item(product_code: str, offers_count: int = 60) -> dict:
+    return {
+        "card": {
+            "id": product_code,
+            "title": f"Товар {product_code} 15.6&#34; {{Edition}}",
+            "price": 100000 + int(product_code) % 1000,
+            "promoConditions": {
+                "brand": "Brand",
+                "categoryCodes": ["Notebooks", "Categories"],
+            },
+        },
+        "breadcrumbs": [
+            {"title": "Компьютеры", "link": "/shop/c/computers/"},
+            {"title": "Ноутбуки", "link": "/shop/c/notebooks/"},
+        ],
+        "specifications": [
+            {
+                "name": f"Группа {group}",
+                "features": [
+                    {
+                        "name": f"Характеристика {group}.{feature}",
+                        "featureValues": [{"value": f"значение {{{feature}}} }}\" {{"}],
+                    }
+                    for feature in range(15)
+                ],
+            }
+            for group in range(10)
+        ],
+        "galleryImages": [
+            {"large": f"https://resources.kaspi.kz/img/m/p/{product_code}-{i}.jpg?format=gallery-large"}
+            for i in range(10)
+        ],
+        # Большие поля, которые парсеру не нужны
+        "merchants": [
+            {"name": f"Продавец {i}", "rating": random.random(), "info": "{" * 3 + "текст" * 50 + "}" * 3}
+            for i in range(offers_count)
+        ],
+        "description": "<p>Описание {товара}</p>" * 500,
+    }
+
+
+def make_product_page(product_code: str, offers_count: int = 60, padding_kb: int = 200) -> str:
+    item = json.dumps(make_item(product_code, offers_count), ensure_ascii=False)
+    padding = "<div class=\"filler\">{ lorem ipsum }</div>\n" * (padding_kb * 1024 // 40)
+    return (
+        "<!DOCTYPE html><html><head><title>Kaspi</title></head><body>\n"
+        f"{padding[:len(padding) // 2]}"
+        f"<script>BACKEND.components.item = {item};</script>\n"
+        f"{padding[len(padding) // 2:]}"
+        "</body></html>"
+    )
+
+
+def make_reviews(rating: float = 4.8, comments: int = 120) -> dict:
+    return {
+        "summary": {"global": rating},
+        "groupSummary": [{"total": comments * 2}, {"total": comments}],
+    }
+
+
+def make_offers_page(product_code: str, page: int, limit: int, total: int) -> dict:
+    first = page * limit
+    return {
+        "total": total,
+        "offers": [
+            {"merchantName": f"Продавец {i}", "price": 100000.0 + i * 500 + int(product_code) % 1000}
+            for i in range(first, min(first + limit, total))
+        ],
+    }
+
+
+def make_listing_page(listing: str, page: int, limit: int, total: int) -> dict:
+    """
+    Страница листинга от новых товаров к старым: у нового товара код больше,
+    поэтому при росте total старые товары сдвигаются на следующие страницы, как на Kaspi.
+    """
+    base = 200000000 + sum(map(ord, listing)) % 1000 * 100000
+    first = page * limit
+    return {
+        "total": total,
+        "data": [
+            {
+                "id": str(base + total - 1 - i),
+                "title": f"{listing} {base + total - 1 - i}",
+                "shopLink": f"/shop/p/{listing.lower()}-{base + total - 1 - i}/",
+            }
+            for i in range(first, min(first + limit, total))
+        ],
+    }
@@ -0,0 +1,102 @@
+"""
+Репозиторий в памяти с тем же интерфейсом, что у ProductRepository, для бенчмарков без Postgres.
+Каждый вызов считается одним походом в БД и может ждать latency секунд.
+"""
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Collection, Mapping, Optional
+import uuid
+from uuid import UUID
+
+from app.repositories.repository import Projection
+from app.schemes.product import OfferSnapshotS, PriceSnapshotS, ProductBaseS, ProductReadS
+from app.services.product_service import ProductService
+
+
+class MemoryStore:
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.products: dict[str, ProductReadS] = {}
+        self.price_history: dict[UUID, list[PriceSnapshotS]] = defaultdict(list)
+        self.offers_history: dict[UUID, list[OfferSnapshotS]] = defaultdict(list)
+        self.round_trips = 0
+
+    @asynccontextmanager
+    async def repository(self) -> AsyncIterator["MemoryProductRepository"]:
+        yield MemoryProductRepository(self)
+
+    @asynccontextmanager
+    async def service(self) -> AsyncIterator[ProductService]:
+        yield ProductService(MemoryProductRepository(self))
+
+
+class MemoryProductRepository:
+    def __init__(self, store: MemoryStore) -> None:
+        self.store = store
+
+    async def _round_trip(self) -> None:
+        self.store.round_trips += 1
+        if self.store.latency:
+            await asyncio.sleep(self.store.latency)
+
+    async def upsert_many(
+        self,
+        schemas: list[ProductBaseS],
+        price_codes: Collection[str] = (),
+        offer_codes: Collection[str] = (),
+        changes: Optional[Mapping[str, dict]] = None,
+    ) -> list[ProductReadS]:
+        await self._round_trip()
+
+        now = datetime.now(timezone.utc)
+        products = []
+        for schema in schemas:
+            original = self.store.products.get(schema.product_code)
+            product = ProductReadS(
+                **schema.model_dump(),
+                id=original.id if original else uuid.uuid4(),
+                created_at=original.created_at if original else now,
+                updated_at=now,
+            )
+            self.store.products[product.product_code] = product
+            if product.product_code in price_codes:
+                self.store.price_history[product.id].append(
+                    PriceSnapshotS(date=now, min_price=product.min_price, max_price=product.max_price)
+                )
+            if product.product_code in offer_codes:
+                self.store.offers_history[product.id].append(OfferSnapshotS(date=now, offers=product.offers))
+            products.append(product)
+
+        return products
+
+    async def get_by_product_code(
+        self, product_code: str, projection: type[Projection] = ProductReadS
+    ) -> Optional[Projection]:
+        await self._round_trip()
+        product = self.store.products.get(product_code)
+        return projection.model_validate(product) if product else None
+
+    async def get_by_product_codes(
+        self, product_codes: list[str], projection: type[Projection] = ProductReadS
+    ) -> list[Projection]:
+        await self._round_trip()
+        return [
+            projection.model_validate(self.store.products[code])
+            for code in product_codes if code in self.store.products
+        ]
+
+    async def get_updated_at_by_product_codes(self, product_codes: list[str]) -> dict[str, datetime]:
+        await self._round_trip()
+        return {
+            code: self.store.products[code].updated_at for code in product_codes if code in self.store.products
+        }
+
+    async def get_price_history(self, product_ids: list[UUID]) -> dict[UUID, list[PriceSnapshotS]]:
+        await self._round_trip()
+        return {id: list(self.store.price_history[id]) for id in product_ids if id in self.store.price_history}
+
+    async def get_offers_history(self, product_ids: list[UUID]) -> dict[UUID, list[OfferSnapshotS]]:
+        await self._round_trip()
+        return {id: list(self.store.offers_history[id]) for id in product_ids if id in self.store.offers_history}
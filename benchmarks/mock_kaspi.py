@@ -0,0 +1,193 @@
+"""
+Локальная замена kaspi.kz для бенчмарков: страницы товаров, review-view, постраничный offer-view
+и листинги категорий/поиска product-view.
+
+Запуск отдельно:
+    python -m benchmarks.mock_kaspi --port 8080 [--latency-ms 50] [--error-rate 0.01] [--pages-dir pages/]
+
+Страницы товаров берутся из --pages-dir (сохраненные *.html, выбираются по product_code),
+без него генерируются из benchmarks.fixtures. Страница отдается с ETag, на If-None-Match отвечает 304.
+
+Листинг берется из --listings-dir/<категория или запрос>.json (сохраненный список карточек
+{"id", "shopLink"} от новых к старым) и делится на страницы по LISTING_PAGE_SIZE,
+без файла генерируется листинг из --listing-products товаров.
+"""
+import argparse
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import random
+import re
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+import zlib
+
+from benchmarks.fixtures import make_listing_page, make_offers_page, make_product_page, make_reviews
+
+PRODUCT_PAGE_PATH = re.compile(r"^/shop/p/[^/]*-(\d+)/?$")
+REVIEWS_PATH = re.compile(r"^/yml/review-view/api/v1/reviews/product/(\d+)$")
+OFFERS_PATH = re.compile(r"^/yml/offer-view/offers/(\d+)$")
+LISTING_PATH = "/yml/product-view/pl/results"
+
+LISTING_PAGE_SIZE = 12
+
+
+class MockKaspiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        offers_count: int = 60,
+        padding_kb: int = 200,
+        pages_dir: Optional[Path] = None,
+        listings_dir: Optional[Path] = None,
+        listing_products: int = 1000,
+    ) -> None:
+        super().__init__(address, MockKaspiHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.offers_count = offers_count
+        self.padding_kb = padding_kb
+        self.recorded_pages = sorted(pages_dir.glob("*.html")) if pages_dir else []
+        self.listings_dir = listings_dir
+        # Можно менять на ходу, чтобы в листингах появлялись новые товары
+        self.listing_products = listing_products
+        self.listing_requests = 0
+
+    @lru_cache(maxsize=1024)
+    def get_product_page(self, product_code: str) -> bytes:
+        if self.recorded_pages:
+            path = self.recorded_pages[zlib.crc32(product_code.encode()) % len(self.recorded_pages)]
+            return path.read_bytes()
+        return make_product_page(product_code, self.offers_count, self.padding_kb).encode()
+
+    def get_listing_page(self, listing: str, page: int) -> dict:
+        path = self.listings_dir / f"{listing}.json" if self.listings_dir else None
+        if path is None or not path.exists():
+            return make_listing_page(listing, page, LISTING_PAGE_SIZE, self.listing_products)
+
+        cards = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(cards, dict):
+            cards = cards["data"]
+        first = page * LISTING_PAGE_SIZE
+        return {"total": len(cards), "data": cards[first:first + LISTING_PAGE_SIZE]}
+
+
+class MockKaspiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockKaspiServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        path, _, query = self.path.partition("?")
+
+        if path == LISTING_PATH:
+            self.handle_listing(parse_qs(query))
+        elif match := PRODUCT_PAGE_PATH.match(path):
+            self.handle_product_page(match[1])
+        elif match := REVIEWS_PATH.match(path):
+            self.handle_request(lambda: self.send_json(make_reviews()))
+        else:
+            self.send_body(HTTPStatus.NOT_FOUND, b"", "text/plain")
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if match := OFFERS_PATH.match(self.path):
+            payload = json.loads(body)
+            self.handle_request(
+                lambda: self.send_json(
+                    make_offers_page(match[1], payload["page"], payload["limit"], self.server.offers_count)
+                )
+            )
+        else:
+            self.send_body(HTTPStatus.NOT_FOUND, b"", "text/plain")
+
+    def handle_product_page(self, product_code: str) -> None:
+        def send_page() -> None:
+            content = self.server.get_product_page(product_code)
+            etag = f'"{zlib.crc32(content):08x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_body(HTTPStatus.NOT_MODIFIED, b"", "text/html", {"ETag": etag})
+            else:
+                self.send_body(HTTPStatus.OK, content, "text/html; charset=utf-8", {"ETag": etag})
+
+        self.handle_request(send_page)
+
+    def handle_listing(self, params: dict[str, list[str]]) -> None:
+        # q=:category:<код> для категории, text=<запрос> для поиска
+        listing = params["q"][0].rsplit(":", 1)[-1] if "q" in params else params["text"][0]
+        page = int(params.get("page", ["0"])[0])
+        self.server.listing_requests += 1
+        self.handle_request(lambda: self.send_json(self.server.get_listing_page(listing, page)))
+
+    def handle_request(self, send) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if random.random() < self.server.error_rate:
+            self.send_body(HTTPStatus.SERVICE_UNAVAILABLE, b"", "text/plain")
+            return
+
+        send()
+
+    def send_json(self, data: dict) -> None:
+        self.send_body(HTTPStatus.OK, json.dumps(data, ensure_ascii=False).encode(), "application/json")
+
+    def send_body(self, status: HTTPStatus, body: bytes, content_type: str, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="задержка каждого ответа")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--offers-count", type=int, default=60, help="офферов у каждого товара")
+    parser.add_argument("--padding-kb", type=int, default=200, help="размер синтетической страницы без item")
+    parser.add_argument("--pages-dir", type=Path, default=None, help="папка с сохраненными страницами *.html")
+    parser.add_argument("--listings-dir", type=Path, default=None, help="папка с сохраненными листингами *.json")
+    parser.add_argument("--listing-products", type=int, default=1000, help="товаров в синтетическом листинге")
+
+
+def serve(host: str, port: int, args: argparse.Namespace) -> None:
+    server = MockKaspiServer(
+        (host, port),
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        offers_count=args.offers_count,
+        padding_kb=args.padding_kb,
+        pages_dir=args.pages_dir,
+        listings_dir=args.listings_dir,
+        listing_products=args.listing_products,
+    )
+    server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"Mock Kaspi on http://{args.host}:{args.port}")
+    serve(args.host, args.port, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Пропускная способность разбора страниц товара в зависимости от числа процессов.
+
+Запуск:
+    python -m benchmarks.parse_pool_benchmark [--pages 200] [--workers 0,1,2,4]
+
+0 процессов - разбор прямо в event loop, как при PARSER__PARSE_PROCESSES=0.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+from app.services.parser_service import extract_product_data
+from benchmarks.fixtures import make_product_page
+
+
+async def run(pages: list[bytes], workers: int) -> float:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    if workers == 0:
+        for content in pages:
+            extract_product_data(content, "utf-8")
+            # Как в пайплайне: между страницами event loop успевает обслужить остальные задачи
+            await asyncio.sleep(0)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Прогрев: запуск процессов и импорт модулей не входят в замер
+            await asyncio.gather(*(loop.run_in_executor(pool, extract_product_data, pages[0], "utf-8") for _ in range(workers)))
+            started = time.perf_counter()
+            await asyncio.gather(*(loop.run_in_executor(pool, extract_product_data, content, "utf-8") for content in pages))
+
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", default="0,1,2,4")
+    args = parser.parse_args()
+
+    pages = [make_product_page(str(117046774 + i)).encode() for i in range(args.pages)]
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB avg")
+
+    baseline = None
+    for workers in map(int, args.workers.split(",")):
+        seconds = asyncio.run(run(pages, workers))
+        baseline = baseline or seconds
+        print(f"  {workers:>2} processes: {len(pages) / seconds:8.1f} pages/s  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Память и скорость ProductStateCache против словаря ProductSummaryS, который держался бы вместо него.
+
+Запуск:
+    python -m benchmarks.state_cache_benchmark [--products 200000] [--max-entries 100000]
+
+При --max-entries меньше --products часть продуктов вытесняется, печатается доля попаданий
+при повторном проходе по всем продуктам.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import time
+import tracemalloc
+import uuid
+
+from app.schemes.product import ProductSummaryS
+from app.services.product_state_cache import ProductStateCache
+from app.utils.fingerprint import get_fingerprints
+
+
+def make_products(count: int) -> list[ProductSummaryS]:
+    now = datetime.now(timezone.utc)
+    return [
+        ProductSummaryS(
+            id=uuid.uuid4(),
+            product_code=str(100000000 + i),
+            name=f"Товар {i}",
+            url=f"https://kaspi.kz/shop/p/benchmark-{100000000 + i}/",
+            category="Smartphones",
+            min_price=1000.0 + i,
+            max_price=2000.0 + i,
+            rating=4.5,
+            comments_count=i % 500,
+            sellers_count=i % 30,
+            fingerprints=get_fingerprints({"image_links": [i], "details": {"i": i}, "offers": [i]}),
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def measure(fill) -> tuple[object, float]:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = tracemalloc.get_traced_memory()[0]
+    result = fill()
+    used = tracemalloc.get_traced_memory()[0] - started
+    tracemalloc.stop()
+    return result, used
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--max-entries", type=int, default=None)
+    args = parser.parse_args()
+
+    products = make_products(args.products)
+    max_entries = args.max_entries or args.products
+
+    def fill_cache() -> ProductStateCache:
+        cache = ProductStateCache(max_entries)
+        for product in products:
+            cache.put(product)
+        return cache
+
+    def fill_dict() -> dict[str, ProductSummaryS]:
+        return {product.product_code: product.model_copy() for product in products[:max_entries]}
+
+    started = time.perf_counter()
+    cache, cache_bytes = measure(fill_cache)
+    put_seconds = time.perf_counter() - started
+    _, dict_bytes = measure(fill_dict)
+
+    started = time.perf_counter()
+    hits = sum(1 for product in products if cache.get(product.product_code) is not None)
+    get_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "products": args.products,
+        "max_entries": max_entries,
+        "cache_bytes_per_entry": round(cache_bytes / len(cache)),
+        "summary_dict_bytes_per_entry": round(dict_bytes / min(max_entries, args.products)),
+        "put_us": round(put_seconds / args.products * 1e6, 2),
+        "get_us": round(get_seconds / args.products * 1e6, 2),
+        "hit_rate": round(hits / args.products, 3),
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()